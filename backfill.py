@@ -0,0 +1,168 @@
+"""
+Backfill Supabase notes for past MeetGeek meetings, several at a time.
+
+Every meeting that starts at or after the cut-off is run through
+supa_from_id on a bounded thread pool, and per-host limits in http_client
+keep each upstream under its own concurrency cap. The outcome of each meeting
+is appended to a JSON-lines checkpoint, so an interrupted run resumes
+where it stopped:
+
+  python backfill.py --cut-off 2026-02-11T00:00:00.000Z --workers 4
+"""
+import argparse
+import json
+import os
+import threading
+import time
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timezone
+
+import groq
+import http_client
+import hubspot
+import meetgeek
+import supa
+from supa_from_id import supa_from_id
+
+
+CHECKPOINT_FILE = "backfill_checkpoint.jsonl"
+DEFAULT_CUT_OFF = "2026-02-11T00:00:00.000Z"
+DEFAULT_WORKERS = 4
+
+# Max requests in flight per upstream while backfilling.
+DEFAULT_LIMITS = {
+    "meetgeek": 4,
+    "hubspot": 2,
+    "supabase": 4,
+    "groq": 2,
+}
+
+_UPSTREAM_URLS = {
+    "meetgeek": meetgeek.BASE_URL,
+    "hubspot": hubspot.BASE_URL,
+    "supabase": supa.SUPABASE_URL,
+    "groq": groq.CHAT_URL,
+}
+
+
+def load_checkpoint(path: str = CHECKPOINT_FILE) -> dict[str, dict]:
+    """Return the latest checkpoint record per meeting_id."""
+    records: dict[str, dict] = {}
+    if not os.path.exists(path):
+        return records
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # A crash can leave a torn last line.
+                continue
+            records[record["meeting_id"]] = record
+    return records
+
+
+def _format_eta(seconds: float) -> str:
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}h{minutes:02d}m{seconds:02d}s"
+
+
+def backfill(
+    cut_off: str = DEFAULT_CUT_OFF,
+    workers: int = DEFAULT_WORKERS,
+    limits: dict[str, int] | None = None,
+    checkpoint: str = CHECKPOINT_FILE,
+    retry_failed: bool = True,
+) -> dict[str, int]:
+    """Create notes for every meeting starting at or after cut_off.
+
+    Meetings already checkpointed as done or skipped are not retried; failed
+    ones (often a transient 429 or timeout) are, unless retry_failed is False.
+    Returns a count per status.
+    """
+    for upstream, limit in {**DEFAULT_LIMITS, **(limits or {})}.items():
+        host = urllib.parse.urlsplit(_UPSTREAM_URLS[upstream]).hostname
+        http_client.set_host_limit(host, limit)
+
+    finished = {"done", "skipped"} if retry_failed else {"done", "skipped", "failed"}
+    previous = load_checkpoint(checkpoint)
+    meetings = meetgeek.get_all_meetings()
+    pending = [
+        m["meeting_id"]
+        for m in meetings
+        if m["timestamp_start_utc"] >= cut_off
+        and previous.get(m["meeting_id"], {}).get("status") not in finished
+    ]
+    # One bulk lookup up front. supa_from_id still checks each meeting just
+    # before summarising it (from the in-memory index), since a webhook job
+    # may create its note while the backfill runs.
+    existing = supa.existing_ids(pending)
+    total = len(pending)
+    print(
+        f"{total} meeting(s) to process ({len(existing)} already in Supabase), "
+        f"{len(previous)} already checkpointed",
+        flush=True,
+    )
+
+    counts = {"done": 0, "skipped": 0, "failed": 0}
+    lock = threading.Lock()
+    started = time.monotonic()
+
+    def run(meeting_id: str) -> dict:
+        t0 = time.monotonic()
+        if meeting_id in existing:
+            return {"meeting_id": meeting_id, "status": "skipped", "seconds": 0.0}
+        try:
+            result = supa_from_id(meeting_id)
+        except Exception as e:
+            return {"meeting_id": meeting_id, "status": "failed", "error": str(e),
+                    "seconds": round(time.monotonic() - t0, 2)}
+        record = {"meeting_id": meeting_id, "seconds": round(time.monotonic() - t0, 2)}
+        if result is None:
+            # Too short to summarise, or a note appeared since the bulk lookup.
+            record["status"] = "skipped"
+        else:
+            record["status"] = "done"
+            record["note_id"] = result["note_id"]
+            record["ids"] = result["ids"]
+        return record
+
+    with open(checkpoint, "a", encoding="utf-8") as out, ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(run, meeting_id) for meeting_id in pending]
+        for future in as_completed(futures):
+            record = future.result()
+            record["at"] = datetime.now(timezone.utc).isoformat()
+            with lock:
+                out.write(json.dumps(record) + "\n")
+                out.flush()
+                counts[record["status"]] += 1
+                completed = sum(counts.values())
+            elapsed = time.monotonic() - started
+            rate = completed / elapsed if elapsed else 0.0
+            eta = (total - completed) / rate if rate else 0.0
+            detail = record.get("error") or record.get("ids") or ""
+            print(
+                f"[{completed}/{total}] {record['meeting_id']} {record['status']} {detail} "
+                f"| {rate * 60:.1f}/min | ETA {_format_eta(eta)}",
+                flush=True,
+            )
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--cut-off", default=DEFAULT_CUT_OFF)
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS)
+    parser.add_argument("--checkpoint", default=CHECKPOINT_FILE)
+    parser.add_argument("--skip-failed", action="store_true", help="don't retry meetings that failed before")
+    for upstream, limit in DEFAULT_LIMITS.items():
+        parser.add_argument(f"--{upstream}-limit", type=int, default=limit)
+    args = parser.parse_args()
+    limits = {upstream: getattr(args, f"{upstream}_limit") for upstream in DEFAULT_LIMITS}
+    counts = backfill(args.cut_off, args.workers, limits, args.checkpoint, not args.skip_failed)
+    print(counts)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Record responses from the live upstream APIs and replay them from the stubs.
+
+Recording wraps http_client's transport, so a benchmark run against the real
+APIs saves every response, keyed on method, path with query and a hash of
+the request body, to <dir>/<upstream>.jsonl. Replaying loads those files into
+the stub servers, which serve a recorded response whenever a request matches
+and fall back to generated data otherwise.
+"""
+import gzip
+import hashlib
+import json
+import os
+import threading
+import urllib.parse
+
+import http_client
+
+
+# Hosts of the live APIs, to file each recorded response under its upstream.
+HOSTS = {
+    "api.meetgeek.ai": "meetgeek",
+    "api.hubapi.com": "hubspot",
+    "api.groq.com": "groq",
+}
+# Response headers worth replaying; the rest describe the live connection.
+KEPT_HEADERS = ("Content-Type", "Content-Range")
+
+
+def key(method: str, path: str, body: bytes | None) -> str:
+    """Identify a request by method, path with query string and body."""
+    digest = hashlib.sha1(body or b"").hexdigest()
+    return f"{method} {path} {digest}"
+
+
+def upstream_for(host: str) -> str | None:
+    if host in HOSTS:
+        return HOSTS[host]
+    if host.endswith(".supabase.co"):
+        return "supabase"
+    return None
+
+
+def load(directory: str) -> dict[str, dict[str, dict]]:
+    """Return recorded responses per upstream, keyed like key()."""
+    recorded: dict[str, dict[str, dict]] = {}
+    if not os.path.isdir(directory):
+        return recorded
+    for name in os.listdir(directory):
+        if not name.endswith(".jsonl"):
+            continue
+        upstream = name[:-len(".jsonl")]
+        entries = recorded.setdefault(upstream, {})
+        with open(os.path.join(directory, name), "r", encoding="utf-8") as f:
+            for line in f:
+                entry = json.loads(line)
+                entries[entry["key"]] = entry
+    return recorded
+
+
+class Recorder:
+    """While active, appends every live upstream response to the fixture files in directory."""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.recorded = 0
+        self._lock = threading.Lock()
+        self._send = None
+
+    def __enter__(self) -> "Recorder":
+        os.makedirs(self.directory, exist_ok=True)
+        self._send = http_client._send
+
+        def send(method, parts, headers, body, timeout):
+            status, resp_headers, data = self._send(method, parts, headers, body, timeout)
+            self._save(method, parts, body, status, resp_headers, data)
+            return status, resp_headers, data
+
+        http_client._send = send
+        return self
+
+    def __exit__(self, *exc) -> None:
+        http_client._send = self._send
+
+    def _save(self, method, parts: urllib.parse.SplitResult, body, status, headers, data) -> None:
+        upstream = upstream_for(parts.hostname or "")
+        if upstream is None:
+            return
+        if headers.get("Content-Encoding", "").lower() == "gzip":
+            data = gzip.decompress(data)
+        path = parts.path + (f"?{parts.query}" if parts.query else "")
+        entry = {
+            "key": key(method, path, body),
+            "status": status,
+            "headers": {name: headers[name] for name in KEPT_HEADERS if headers.get(name)},
+            "body": data.decode("utf-8", errors="replace"),
+        }
+        with self._lock:
+            with open(os.path.join(self.directory, f"{upstream}.jsonl"), "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry) + "\n")
+            self.recorded += 1
@@ -0,0 +1,204 @@
+"""
+Benchmark the meeting pipeline offline, stage by stage.
+
+  python -m bench.run                       # generated data from local stubs
+  python -m bench.run --contacts 20000 --transcript-pages 10 --groq-latency 1
+  python -m bench.run --live --record fixtures/   # live APIs, saving responses
+  python -m bench.run --replay fixtures/          # stubs serving those responses
+  python -m bench.run --output bench_results.jsonl   # append results to track over time
+
+Every run works in a fresh temporary directory, so the stores and caches
+(transcript_store, contacts.db, cache.db, ...) start cold. Each stage reports
+wall time, requests per upstream and peak memory allocated while it ran.
+tracemalloc slows Python down noticeably; pass --no-memory for timings alone.
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+import urllib.parse
+from datetime import datetime, timezone
+
+from bench import fixtures
+from bench.stubs import StubConfig, start_stubs
+
+
+# Credentials the modules read at import; any value works against the stubs.
+_STUB_ENV = ("MEETGEEK_API_KEY", "HUBSPOT_API_KEY", "SUPABASE_SECRET", "GROQ_API_KEY")
+
+
+def _rebase(url: str, base: str) -> str:
+    """Return url with its scheme and host replaced by those of base."""
+    parts = urllib.parse.urlsplit(url)
+    new = urllib.parse.urlsplit(base)
+    return urllib.parse.urlunsplit((new.scheme, new.netloc, parts.path, parts.query, parts.fragment))
+
+
+def point_at_stubs(stubs: dict) -> None:
+    """Point the upstream URL constants of the app modules at the stub servers."""
+    import download_db
+    import groq
+    import hubspot
+    import meetgeek
+    import supa
+
+    meetgeek.BASE_URL = stubs["meetgeek"].url
+    hubspot.SEARCH_URL = _rebase(hubspot.SEARCH_URL, stubs["hubspot"].url)
+    hubspot.BASE_URL = stubs["hubspot"].url
+    supa.SUPABASE_URL = stubs["supabase"].url
+    download_db.BASE_URL = _rebase(download_db.BASE_URL, stubs["supabase"].url)
+    groq.CHAT_URL = _rebase(groq.CHAT_URL, stubs["groq"].url)
+
+
+def measure(name: str, fn, memory: bool = True) -> dict:
+    """Run fn once and return its wall time, upstream requests and peak memory."""
+    import metrics
+
+    before = metrics.upstream_requests.totals("upstream")
+    if memory:
+        tracemalloc.reset_peak()
+        baseline = tracemalloc.get_traced_memory()[0]
+    started = time.perf_counter()
+    error = None
+    try:
+        fn()
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+    seconds = time.perf_counter() - started
+    after = metrics.upstream_requests.totals("upstream")
+    result = {
+        "stage": name,
+        "seconds": round(seconds, 4),
+        "calls": {u: int(n - before.get(u, 0)) for u, n in sorted(after.items()) if n - before.get(u, 0)},
+    }
+    if memory:
+        result["peak_kib"] = round((tracemalloc.get_traced_memory()[1] - baseline) / 1024, 1)
+    if error:
+        result["error"] = error
+    return result
+
+
+def stages(allow_writes: bool) -> list[tuple[str, object]]:
+    """The stages to run, in order; later ones see the caches the earlier ones filled."""
+    import meetgeek
+    from contact_loader import load_full, load_short
+    from generate_ids import generate_ids
+    from supa_from_id import supa_from_id
+
+    meeting_ids: list[str] = []
+
+    def list_meetings():
+        meetings, _ = meetgeek.list_meetings()
+        meeting_ids.extend(m.get("meeting_id") or m.get("id") for m in meetings[:2])
+
+    def first():
+        return meeting_ids[0]
+
+    def second():
+        return meeting_ids[1] if len(meeting_ids) > 1 else meeting_ids[0]
+
+    result = [
+        ("list_meetings", list_meetings),
+        ("load_full (cold)", load_full),
+        ("load_full (warm)", load_full),
+        ("load_short", load_short),
+        ("get_transcript (cold)", lambda: meetgeek.get_transcript(first())),
+        ("get_transcript (warm)", lambda: meetgeek.get_transcript(first())),
+        ("generate_ids", lambda: generate_ids(first())),
+    ]
+    if allow_writes:
+        # Writes a note, so only against the stubs unless asked for.
+        result.append(("supa_from_id", lambda: supa_from_id(second())))
+    return result
+
+
+def report(results: list[dict]) -> str:
+    lines = [f"{'stage':<24} {'seconds':>9} {'peak KiB':>10}  upstream calls"]
+    for r in results:
+        calls = " ".join(f"{u}={n}" for u, n in r["calls"].items()) or "-"
+        peak = f"{r['peak_kib']:>10.1f}" if "peak_kib" in r else f"{'-':>10}"
+        line = f"{r['stage']:<24} {r['seconds']:>9.4f} {peak}  {calls}"
+        if "error" in r:
+            line += f"  ERROR {r['error']}"
+        lines.append(line)
+    return "\n".join(lines)
+
+
+def run(config: StubConfig, live: bool = False, record: str | None = None, replay: str | None = None,
+        memory: bool = True, allow_writes: bool = False) -> list[dict]:
+    """Run every stage in a temporary working directory and return the per-stage results."""
+    record = os.path.abspath(record) if record else None
+    recorded = fixtures.load(os.path.abspath(replay)) if replay else None
+    stubs = None
+    if not live:
+        stubs = start_stubs(config, recorded)
+        for name in _STUB_ENV:
+            os.environ[name] = "bench"
+
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory(prefix="bench-") as workdir:
+        # Relative paths of every store and cache now land in workdir.
+        os.chdir(workdir)
+        try:
+            if stubs:
+                point_at_stubs(stubs)
+            if memory:
+                tracemalloc.start()
+            recorder = fixtures.Recorder(record) if record else None
+            if recorder:
+                recorder.__enter__()
+            try:
+                results = [measure(name, fn, memory) for name, fn in stages(allow_writes or not live)]
+            finally:
+                if recorder:
+                    recorder.__exit__(None, None, None)
+                if memory:
+                    tracemalloc.stop()
+        finally:
+            # The log and trace writers open their relative paths on each
+            # write, so drain them before leaving workdir.
+            import request_log
+            import tracing
+
+            request_log.flush()
+            tracing.flush()
+            os.chdir(cwd)
+            if stubs:
+                for stub in stubs.values():
+                    stub.stop()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    defaults = StubConfig()
+    for name, value in defaults.as_dict().items():
+        parser.add_argument(f"--{name.replace('_', '-')}", type=type(value), default=value)
+    parser.add_argument("--live", action="store_true", help="use the real APIs instead of the stubs")
+    parser.add_argument("--record", metavar="DIR", help="save upstream responses to DIR")
+    parser.add_argument("--replay", metavar="DIR", help="serve responses recorded in DIR from the stubs")
+    parser.add_argument("--allow-writes", action="store_true", help="run supa_from_id against the live APIs")
+    parser.add_argument("--no-memory", action="store_true", help="skip tracemalloc")
+    parser.add_argument("--output", metavar="FILE", help="append the results as a JSON line to FILE")
+    args = parser.parse_args()
+
+    config = StubConfig(**{name: getattr(args, name) for name in defaults.as_dict()})
+    results = run(config, args.live, args.record, args.replay, not args.no_memory, args.allow_writes)
+    print(report(results))
+    if args.output:
+        record = {
+            "at": datetime.now(timezone.utc).isoformat(),
+            "mode": "live" if args.live else "replay" if args.replay else "stub",
+            "config": config.as_dict(),
+            "python": sys.version.split()[0],
+            "stages": results,
+        }
+        with open(args.output, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record) + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,312 @@
+"""
+Local stand-ins for the MeetGeek, HubSpot, Supabase and Groq APIs.
+
+Each upstream gets its own threaded HTTP server on 127.0.0.1 that serves
+deterministic generated data shaped like the real API, sleeps for a
+configurable latency per request and counts the requests it answered.
+Responses recorded from the live APIs (see fixtures.py) are served instead
+of generated ones when a request matches.
+"""
+import json
+import random
+import threading
+import time
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from bench import fixtures
+
+
+UPSTREAMS = ("meetgeek", "hubspot", "supabase", "groq")
+
+FIRST_NAMES = ("Ann", "Bob", "Chen", "Dana", "Eli", "Fatima", "Goran", "Hana", "Ivan", "Jaya", "Kofi", "Lena")
+LAST_NAMES = ("Lee", "Stone", "Wright", "Okafor", "Silva", "Novak", "Haddad", "Kim", "Moreau", "Patel")
+
+
+class StubConfig:
+    """Sizes and latencies of the generated upstream data."""
+
+    def __init__(
+        self,
+        latency: float = 0.02,
+        groq_latency: float = 0.2,
+        meetings: int = 20,
+        transcript_pages: int = 4,
+        sentences_per_page: int = 500,
+        contacts: int = 2000,
+        supabase_contacts: int = 500,
+        summary_chars: int = 3000,
+        seed: int = 0,
+    ):
+        self.latency = latency
+        self.groq_latency = groq_latency
+        self.meetings = meetings
+        self.transcript_pages = transcript_pages
+        self.sentences_per_page = sentences_per_page
+        self.contacts = contacts
+        self.supabase_contacts = supabase_contacts
+        self.summary_chars = summary_chars
+        self.seed = seed
+
+    def as_dict(self) -> dict:
+        return dict(vars(self))
+
+
+class StubData:
+    """The generated contents of all four upstreams, plus the notes written during a run."""
+
+    def __init__(self, config: StubConfig):
+        # Imported late: the app modules read their credentials on import.
+        import contact_store
+
+        rng = random.Random(config.seed)
+        self.config = config
+        names = [f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}-{i}" for i in range(config.contacts)]
+        self.contacts = [
+            {
+                "id": str(1000 + i),
+                "properties": {
+                    "firstname": name.split()[0],
+                    "lastname": name.split()[1],
+                    "email": f"contact{i}@example.com",
+                    "lastmodifieddate": f"2026-01-{1 + i % 28:02d}T00:00:00.000Z",
+                    "hubspot_owner_id": contact_store.OWNER_IDS[i % len(contact_store.OWNER_IDS)],
+                },
+            }
+            for i, name in enumerate(names)
+        ]
+        self.supabase_contacts = [
+            {"hubspot_id": c["id"], "name": f"{c['properties']['firstname']} {c['properties']['lastname']}", "email": ""}
+            for c in rng.sample(self.contacts, min(config.supabase_contacts, len(self.contacts)))
+        ]
+        self.meetings = [
+            {
+                "meeting_id": f"meeting-{i:04d}",
+                "title": f"Meeting {i}",
+                "timestamp_start_utc": f"2026-02-{1 + i % 28:02d}T10:00:00.000Z",
+                "timestamp_end_utc": f"2026-02-{1 + i % 28:02d}T10:45:00.000Z",
+            }
+            for i in range(config.meetings, 0, -1)  # newest first, like the API
+        ]
+        # Per meeting: two contacts named in full, one by first name only (left to the LLM), one unnamed.
+        self.speakers = {}
+        for meeting in self.meetings:
+            picked = rng.sample(names, 3)
+            self.speakers[meeting["meeting_id"]] = [picked[0], picked[1], picked[2].split()[0], "Speaker_1"]
+        self.notes: list[dict] = []
+        self._notes_lock = threading.Lock()
+
+    def sentences(self, meeting_id: str, page: int) -> list[dict]:
+        speakers = self.speakers.get(meeting_id) or ["Speaker_1"]
+        per_page = self.config.sentences_per_page
+        return [
+            {
+                "id": page * per_page + i,
+                "speaker": speakers[(page * per_page + i) // 3 % len(speakers)],
+                "transcript": f"Sentence {page * per_page + i} of the discussion about the round and the product roadmap.",
+                "timestamp": "2026-02-01T10:00:00.000Z",
+            }
+            for i in range(per_page)
+        ]
+
+    def add_note(self, external_id: str | None) -> int:
+        with self._notes_lock:
+            note_id = len(self.notes) + 1
+            self.notes.append({"id": note_id, "external_id": external_id})
+            return note_id
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: "StubServer"
+
+    def log_message(self, *args):
+        pass
+
+    def _reply(self, status: int, body: bytes, headers: dict | None = None) -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", (headers or {}).get("Content-Type", "application/json"))
+        for name, value in (headers or {}).items():
+            if name != "Content-Type":
+                self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _handle(self, method: str) -> None:
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length) if length else b""
+        self.server.count()
+        time.sleep(self.server.latency)
+
+        recorded = self.server.fixtures.get(fixtures.key(method, self.path, body))
+        if recorded is not None:
+            self._reply(recorded["status"], recorded["body"].encode("utf-8"), recorded["headers"])
+            return
+
+        parts = urllib.parse.urlsplit(self.path)
+        query = {k: v[0] for k, v in urllib.parse.parse_qs(parts.query).items()}
+        payload = json.loads(body) if body else None
+        route = getattr(self.server, f"_{self.server.upstream}")
+        result = route(method, parts.path, query, payload, self)
+        if result is None:
+            return
+        status, obj, headers = result
+        self._reply(status, json.dumps(obj).encode("utf-8"), headers)
+
+    def do_GET(self):
+        self._handle("GET")
+
+    def do_POST(self):
+        self._handle("POST")
+
+
+class StubServer(ThreadingHTTPServer):
+    """One upstream's stand-in; url is its base URL and calls its request count."""
+
+    daemon_threads = True
+
+    def __init__(self, upstream: str, data: StubData, latency: float, recorded: dict | None = None):
+        super().__init__(("127.0.0.1", 0), _Handler)
+        self.upstream = upstream
+        self.data = data
+        self.latency = latency
+        self.fixtures = recorded or {}
+        self.calls = 0
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self.serve_forever, name=f"stub-{upstream}", daemon=True)
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_port}"
+
+    def count(self) -> None:
+        with self._lock:
+            self.calls += 1
+
+    def start(self) -> "StubServer":
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
+
+    # Routes per upstream: return (status, JSON object, headers), or None if already replied.
+
+    def _meetgeek(self, method, path, query, payload, handler):
+        data = self.data
+        segments = path.strip("/").split("/")
+        if segments[:2] == ["v1", "teams"]:
+            start = int(query.get("cursor", 0))
+            limit = int(query.get("limit", 500))
+            page = data.meetings[start:start + limit]
+            cursor = str(start + limit) if start + limit < len(data.meetings) else None
+            return 200, {"meetings": page, "pagination": {"next_cursor": cursor}}, None
+        if segments[:2] == ["v1", "meetings"] and len(segments) == 4 and segments[3] == "transcript":
+            page = int(query.get("cursor", 0))
+            cursor = str(page + 1) if page + 1 < data.config.transcript_pages else None
+            return 200, {"sentences": data.sentences(segments[2], page), "pagination": {"next_cursor": cursor}}, None
+        if segments[:2] == ["v1", "meetings"] and len(segments) == 3:
+            for meeting in data.meetings:
+                if meeting["meeting_id"] == segments[2]:
+                    return 200, meeting, None
+            return 404, {"message": "Meeting not found"}, None
+        return 404, {"message": "Not found"}, None
+
+    def _hubspot(self, method, path, query, payload, handler):
+        def matches(contact, f):
+            value = contact["properties"].get(f["propertyName"])
+            op = f["operator"]
+            if op == "EQ":
+                return value == f["value"]
+            if op == "GTE":
+                return value is not None and value >= f["value"]
+            if op == "NOT_IN":
+                return value is not None and value not in f["values"]
+            if op == "NOT_HAS_PROPERTY":
+                return value is None
+            return False
+
+        matching = [
+            c for c in self.data.contacts
+            if any(all(matches(c, f) for f in group["filters"]) for group in payload["filterGroups"])
+        ]
+        matching.sort(key=lambda c: c["properties"]["lastmodifieddate"])
+        start = int(payload.get("after") or 0)
+        limit = payload.get("limit", 100)
+        result = {"results": matching[start:start + limit]}
+        if start + limit < len(matching):
+            result["paging"] = {"next": {"after": str(start + limit)}}
+        return 200, result, None
+
+    def _supabase(self, method, path, query, payload, handler):
+        if path.endswith("/rpc/get_unique_hubspot_attendees"):
+            return 200, self.data.supabase_contacts, None
+        if path.endswith("/rpc/create_note_with_attendees"):
+            return 200, self.data.add_note(payload.get("external_id")), None
+        table = path.rsplit("/", 1)[1]
+        rows = list(self.data.notes) if table == "notes" else []
+        for column, condition in query.items():
+            op, _, value = condition.partition(".")
+            if op == "gt":
+                rows = [r for r in rows if r.get(column, 0) > int(value)]
+            elif op == "eq":
+                rows = [r for r in rows if str(r.get(column)) == value]
+            elif op == "in":
+                wanted = {v.strip('"') for v in value.strip("()").split(",")}
+                rows = [r for r in rows if r.get(column) in wanted]
+        total = len(rows)
+        if "Range" in handler.headers:
+            first, last = (int(n) for n in handler.headers["Range"].split("-"))
+            rows = rows[first:last + 1]
+        else:
+            first = 0
+        if "limit" in query:
+            rows = rows[:int(query["limit"])]
+        headers = {"Content-Range": f"{first}-{first + len(rows) - 1}/{total}"} if rows else {"Content-Range": f"*/{total}"}
+        return 200, rows, headers
+
+    def _groq(self, method, path, query, payload, handler):
+        system = payload["messages"][0]["content"]
+        user = payload["messages"][1]["content"]
+        if "hubspot id" in system:
+            # Name -> id matching: pick the first candidate for each name.
+            names = json.loads(system[system.index("["):system.index("]") + 1])
+            candidates = json.loads(user)
+            content = json.dumps(candidates[:len(names)])
+        elif "information extraction" in system:
+            content = "[]"
+        else:
+            sentence = "The founders described the product, the round and the next steps. "
+            content = (sentence * (self.data.config.summary_chars // len(sentence) + 1))[:self.data.config.summary_chars]
+
+        if not payload.get("stream"):
+            return 200, {"choices": [{"message": {"role": "assistant", "content": content}}]}, None
+
+        handler.send_response(200)
+        handler.send_header("Content-Type", "text/event-stream")
+        handler.send_header("Connection", "close")
+        handler.end_headers()
+        for start in range(0, len(content), 40):
+            chunk = {"choices": [{"delta": {"content": content[start:start + 40]}}]}
+            handler.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+            handler.wfile.flush()
+        handler.wfile.write(b"data: [DONE]\n\n")
+        handler.close_connection = True
+        return None
+
+
+def start_stubs(config: StubConfig, recorded: dict | None = None) -> dict[str, StubServer]:
+    """Start one stub server per upstream, serving recorded fixtures where they match."""
+    data = StubData(config)
+    recorded = recorded or {}
+    return {
+        upstream: StubServer(
+            upstream,
+            data,
+            config.groq_latency if upstream == "groq" else config.latency,
+            recorded.get(upstream),
+        ).start()
+        for upstream in UPSTREAMS
+    }
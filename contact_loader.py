@@ -1,8 +1,9 @@
-import json
 import os
+import threading
+import time
 
+import contact_store
 from deduplicate_contacts import deduplicate_contacts
-from hubspot import get_contacts_for_owner
 from supa import get_contacts_from_supabase
 
 us = [
@@ -38,22 +39,108 @@ us = [
   }
 ]
 
+# Remote sources (HubSpot sync, Supabase RPC) are considered fresh for this
+# many seconds. After that the stale value is still served while a background
+# thread fetches a new one.
+REMOTE_TTL = int(os.environ.get("CONTACTS_TTL", 300))
+
+
+class _Source:
+    """A cached value refreshed with stale-while-revalidate semantics.
+
+    The first call blocks on fetch(); later calls return the current value
+    immediately and, once it is older than ttl, start one background refresh.
+    A failed background refresh keeps serving the old value.
+    """
+
+    def __init__(self, fetch, ttl: float):
+        self.fetch = fetch
+        self.ttl = ttl
+        self.value = None
+        self.fetched_at = 0.0
+        self.version = 0
+        self._lock = threading.Lock()
+        self._refreshing = False
+
+    def _refresh(self) -> None:
+        try:
+            value = self.fetch()
+        except Exception:
+            with self._lock:
+                self._refreshing = False
+            return
+        with self._lock:
+            self.value = value
+            self.fetched_at = time.monotonic()
+            self.version += 1
+            self._refreshing = False
+
+    def current(self) -> tuple:
+        """Return (value, version), starting a background refresh if stale."""
+        with self._lock:
+            if self.version:
+                if not self._refreshing and time.monotonic() - self.fetched_at > self.ttl:
+                    self._refreshing = True
+                    threading.Thread(target=self._refresh, daemon=True).start()
+                return self.value, self.version
+        # Nothing cached yet: fetch in the caller so errors propagate.
+        value = self.fetch()
+        with self._lock:
+            if self.version == 0:
+                self.value = value
+                self.fetched_at = time.monotonic()
+                self.version += 1
+            return self.value, self.version
+
+
+TAMMER, ALEXA = contact_store.OWNER_IDS
+
+
+def _sync_owned() -> dict[str, list[dict]]:
+    """Pull the HubSpot delta for each owner into contact_store and return their contacts."""
+    contact_store.sync_all((TAMMER, ALEXA))
+    return {owner_id: contact_store.load_contacts(owner_id) for owner_id in (TAMMER, ALEXA)}
+
+
+_owned = _Source(_sync_owned, REMOTE_TTL)
+_supabase = _Source(get_contacts_from_supabase, REMOTE_TTL)
+
+_snapshots: dict[str, tuple[tuple, list[dict]]] = {}
+_snapshots_lock = threading.Lock()
+
+
+def _snapshot(key: str, sources: tuple, build) -> list[dict]:
+    """Return the memoized contact list for key, rebuilding it when any source changed."""
+    values, versions = zip(*(source.current() for source in sources))
+    with _snapshots_lock:
+        cached = _snapshots.get(key)
+        if cached is not None and cached[0] == versions:
+            return cached[1]
+    contacts = build(*values)
+    with _snapshots_lock:
+        _snapshots[key] = (versions, contacts)
+    return contacts
+
 
 def load_full():
-    base = os.path.dirname(os.path.abspath(__file__))
-    with open(os.path.join(base, "tammer.json")) as f:
-        tammer = json.load(f)
-    with open(os.path.join(base, "alexa.json")) as f:
-        alexa = json.load(f)
-    fresh = get_contacts_for_owner("29286558", "2026-02-01T00:00:00.000Z")
-    rv = deduplicate_contacts(fresh + tammer + alexa)
-    return us + rv
+    """Return our team plus the contacts owned by Tammer and Alexa.
+
+    The list is a shared snapshot: callers must not mutate it.
+    """
+    return _snapshot(
+        "full",
+        (_owned,),
+        lambda owned: us + deduplicate_contacts(owned[TAMMER] + owned[ALEXA]),
+    )
 
 
 def load_short():
-    base = os.path.dirname(os.path.abspath(__file__))
-    with open(os.path.join(base, "tammer.json")) as f:
-        tammer = json.load(f)
-    supa = get_contacts_from_supabase()
-    fresh = get_contacts_for_owner("29286558", "2026-02-01T00:00:00.000Z")
-    return deduplicate_contacts(fresh + tammer + supa)
+    """Return Tammer's contacts plus everyone already recorded as an attendee in Supabase.
+
+    The list is a shared snapshot: callers must not mutate it.
+    """
+    return _snapshot(
+        "short",
+        (_owned, _supabase),
+        lambda owned, supa: deduplicate_contacts(owned[TAMMER] + supa),
+    )
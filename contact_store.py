@@ -0,0 +1,171 @@
+"""
+Local SQLite store of HubSpot contacts, kept current by incremental sync.
+
+Each owner has a high-water mark: the newest `lastmodifieddate` seen in a
+previous sync. A sync only asks HubSpot for contacts modified at or after
+that mark and upserts them, so its cost is proportional to what changed.
+The first sync of an owner pulls their full history. Every page is saved
+with the mark it reaches, so an interrupted first sync resumes from there.
+
+sync_all also removes contacts that were moved to another owner (or left
+without one) since its last run, under the NOT_OWNED mark.
+"""
+import os
+import sqlite3
+
+from hubspot import iter_contact_pages, iter_contacts_not_owned_by
+
+
+DB_PATH = os.environ.get("CONTACTS_DB", "contacts.db")
+
+OWNER_IDS = (
+    "29286558",  # Tammer
+    "607052576",  # Alexa
+)
+# sync_state key of the high-water mark for contacts moved away from the owners.
+NOT_OWNED = "not_owned"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS contacts (
+    hubspot_id TEXT PRIMARY KEY,
+    owner_id TEXT NOT NULL,
+    name TEXT NOT NULL,
+    email TEXT NOT NULL,
+    last_modified TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS contacts_owner ON contacts (owner_id, last_modified);
+CREATE TABLE IF NOT EXISTS sync_state (
+    owner_id TEXT PRIMARY KEY,
+    high_water TEXT NOT NULL
+);
+"""
+
+
+def _connect() -> sqlite3.Connection:
+    conn = sqlite3.connect(DB_PATH, timeout=30)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.executescript(_SCHEMA)
+    return conn
+
+
+def get_high_water(owner_id: str) -> str | None:
+    """Return the newest lastmodifieddate synced for owner_id, or None if never synced."""
+    conn = _connect()
+    try:
+        row = conn.execute(
+            "SELECT high_water FROM sync_state WHERE owner_id = ?", (owner_id,)
+        ).fetchone()
+    finally:
+        conn.close()
+    return row[0] if row else None
+
+
+def _set_high_water(conn: sqlite3.Connection, key: str, high_water: str) -> None:
+    conn.execute(
+        """
+        INSERT INTO sync_state (owner_id, high_water) VALUES (?, ?)
+        ON CONFLICT (owner_id) DO UPDATE SET high_water = excluded.high_water
+        """,
+        (key, high_water),
+    )
+
+
+def _newest(contacts: list[dict], high_water: str | None) -> str | None:
+    return max([high_water or "", *(c["last_modified"] for c in contacts)]) or None
+
+
+def sync_owner(owner_id: str) -> int:
+    """Fetch contacts changed since the owner's high-water mark and upsert them.
+
+    Returns the number of contacts received from HubSpot.
+    """
+    high_water = get_high_water(owner_id)
+    received = 0
+    conn = _connect()
+    try:
+        # Pages arrive oldest change first, so each page's newest date is a
+        # safe mark to resume from.
+        for contacts in iter_contact_pages(owner_id, high_water):
+            if not contacts:
+                continue
+            received += len(contacts)
+            high_water = _newest(contacts, high_water)
+            with conn:
+                conn.executemany(
+                    """
+                    INSERT INTO contacts (hubspot_id, owner_id, name, email, last_modified)
+                    VALUES (:hubspot_id, :owner_id, :name, :email, :last_modified)
+                    ON CONFLICT (hubspot_id) DO UPDATE SET
+                        owner_id = excluded.owner_id,
+                        name = excluded.name,
+                        email = excluded.email,
+                        last_modified = excluded.last_modified
+                    """,
+                    [{**c, "owner_id": owner_id} for c in contacts],
+                )
+                if high_water:
+                    _set_high_water(conn, owner_id, high_water)
+    finally:
+        conn.close()
+    return received
+
+
+def remove_moved(owner_ids: tuple[str, ...], since: str) -> int:
+    """Delete stored contacts modified since `since` that none of owner_ids owns any more.
+
+    Returns the number of contacts deleted.
+    """
+    high_water = get_high_water(NOT_OWNED) or since
+    removed = 0
+    conn = _connect()
+    try:
+        for contacts in iter_contacts_not_owned_by(list(owner_ids), high_water):
+            if not contacts:
+                continue
+            high_water = _newest(contacts, high_water)
+            with conn:
+                removed += conn.executemany(
+                    "DELETE FROM contacts WHERE hubspot_id = ?", [(c["hubspot_id"],) for c in contacts]
+                ).rowcount
+                _set_high_water(conn, NOT_OWNED, high_water)
+    finally:
+        conn.close()
+    return removed
+
+
+def sync_all(owner_ids: tuple[str, ...] = OWNER_IDS) -> dict[str, int]:
+    """Sync every owner in owner_ids, then drop contacts moved away from them.
+
+    Returns the number of contacts received per owner.
+    """
+    # Moves are looked for from the oldest mark an owner had before this sync;
+    # contacts moved before an owner's first sync were never stored.
+    marks = [mark for mark in map(get_high_water, owner_ids) if mark]
+    counts = {owner_id: sync_owner(owner_id) for owner_id in owner_ids}
+    if marks:
+        remove_moved(owner_ids, min(marks))
+    return counts
+
+
+def load_contacts(owner_id: str) -> list[dict]:
+    """Return the stored contacts for owner_id, most recently modified first."""
+    conn = _connect()
+    try:
+        rows = conn.execute(
+            """
+            SELECT hubspot_id, name, email, last_modified FROM contacts
+            WHERE owner_id = ? ORDER BY last_modified DESC
+            """,
+            (owner_id,),
+        ).fetchall()
+    finally:
+        conn.close()
+    return [
+        {"hubspot_id": hubspot_id, "name": name, "email": email, "last_modified": last_modified}
+        for hubspot_id, name, email, last_modified in rows
+    ]
+
+
+if __name__ == "__main__":
+    for owner, count in sync_all().items():
+        print(f"{owner}: {count} contact(s) received")
@@ -1,19 +1,48 @@
 """
 Download Supabase tables (notes, attendees, profiles) via REST API
-and write each to a JSON file. Requires SUPABASE_SERVICE_ROLE_KEY or
-SUPABASE_ANON_KEY in the environment.
+and write each to a gzip-compressed NDJSON file (one row per line).
+Requires SUPABASE_SERVICE_ROLE_KEY or SUPABASE_ANON_KEY in the environment.
+
+Tables are downloaded concurrently. The first page of each table also
+returns the total row count (Content-Range), after which the remaining
+pages are fetched in parallel and streamed to disk in order, so memory
+stays bounded by a few pages.
+
+With incremental=True (`python download_db.py --incremental`) only new or
+updated rows are fetched and upserted into a local SQLite replica, which is
+then copied to a rotating snapshot file instead.
 """
 
+import argparse
+import gzip
 import os
-import urllib.request
-import urllib.error
 import json
+import sqlite3
+import urllib.parse
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
+import http_client
+import metrics
+
 
 BASE_URL = "https://uhvcbstdykcvgmzqpvpd.supabase.co/rest/v1"
 TABLES = ("notes", "attendees", "profiles")
 PAGE_SIZE = 1000
+# Parallel page requests per table.
+PAGE_WORKERS = int(os.environ.get("DOWNLOAD_DB_PAGE_WORKERS", 4))
+
+REPLICA_DB = os.environ.get("SUPABASE_REPLICA_DB", "supabase_replica.db")
+# Row fields exposed as indexed columns in the replica. The attendees column
+# names are assumed from the create_note_with_attendees RPC, not read from the
+# schema; sync_table warns when synced rows lack one, since json_extract would
+# silently index NULLs.
+REPLICA_INDEXES = {
+    "notes": ("external_id",),
+    "attendees": ("note_id", "profile_id"),
+    "profiles": (),
+}
 
 
 def get_api_key() -> str:
@@ -29,59 +58,253 @@ def get_api_key() -> str:
     return key
 
 
-def fetch_table(table: str, api_key: str) -> list[dict]:
-    """Fetch all rows from a Supabase table using Range pagination."""
-    headers = {
+def _headers(api_key: str) -> dict:
+    return {
         "apikey": api_key,
         "Authorization": f"Bearer {api_key}",
         "Accept": "application/json",
         "Content-Type": "application/json",
     }
-    rows: list[dict] = []
-    start = 0
-
-    while True:
-        end = start + PAGE_SIZE - 1
-        headers_with_range = {**headers, "Range": f"{start}-{end}"}
-        url = f"{BASE_URL}/{table}?order=id.asc"
-        req = urllib.request.Request(url, headers=headers_with_range, method="GET")
-        try:
-            with urllib.request.urlopen(req) as resp:
-                chunk = json.loads(resp.read().decode())
-        except urllib.error.HTTPError as e:
-            body = e.read().decode()
-            raise RuntimeError(
-                f"Supabase API error for {table} {e.code}: {body}"
-            ) from e
-        except urllib.error.URLError as e:
-            raise RuntimeError(f"Request failed for {table}: {e.reason}") from e
-
-        if isinstance(chunk, list):
-            rows.extend(chunk)
-            if len(chunk) < PAGE_SIZE:
+
+
+def _fetch_page(
+    table: str, api_key: str, start: int, count: bool = False, filters: str = ""
+) -> tuple[list[dict], int | None]:
+    """Fetch rows [start, start + PAGE_SIZE) of table ordered by id.
+
+    filters is an extra PostgREST query string, e.g. "id=gt.42". With
+    count=True the total row count is requested too and returned from the
+    Content-Range header ("0-999/12345"); otherwise the total is None.
+    """
+    headers = {**_headers(api_key), "Range": f"{start}-{start + PAGE_SIZE - 1}"}
+    if count:
+        headers["Prefer"] = "count=exact"
+    url = f"{BASE_URL}/{table}?order=id.asc"
+    if filters:
+        url += f"&{filters}"
+    resp = http_client.request("GET", url, headers=headers, service=f"Supabase {table}")
+    chunk = resp.json()
+    rows = chunk if isinstance(chunk, list) else []
+
+    total = None
+    content_range = resp.headers.get("Content-Range", "")
+    if count and "/" in content_range:
+        size = content_range.rsplit("/", 1)[1]
+        if size.isdigit():
+            total = int(size)
+    return rows, total
+
+
+def iter_table_pages(table: str, api_key: str, filters: str = ""):
+    """Yield the pages of a table in id order, fetching up to PAGE_WORKERS pages at once."""
+    pages = 0
+    try:
+        for rows in _iter_table_pages(table, api_key, filters):
+            pages += 1
+            yield rows
+    finally:
+        metrics.fetch_pages.observe(pages, fetch=f"supabase_{table}")
+
+
+def _iter_table_pages(table: str, api_key: str, filters: str):
+    first, total = _fetch_page(table, api_key, 0, count=True, filters=filters)
+    yield first
+
+    if total is None:
+        # No count available: fall back to walking pages until a short one.
+        start = PAGE_SIZE
+        rows = first
+        while len(rows) == PAGE_SIZE:
+            rows, _ = _fetch_page(table, api_key, start, filters=filters)
+            yield rows
+            start += PAGE_SIZE
+        return
+
+    starts = iter(range(PAGE_SIZE, total, PAGE_SIZE))
+    with ThreadPoolExecutor(max_workers=PAGE_WORKERS) as pool:
+        pending = deque()
+        # Keep a bounded window of requests in flight and yield in order.
+        for start in starts:
+            pending.append(pool.submit(_fetch_page, table, api_key, start, False, filters))
+            if len(pending) >= PAGE_WORKERS * 2:
                 break
-        else:
-            rows.extend(chunk if isinstance(chunk, list) else [])
-            break
-        start = end + 1
+        while pending:
+            rows, _ = pending.popleft().result()
+            next_start = next(starts, None)
+            if next_start is not None:
+                pending.append(pool.submit(_fetch_page, table, api_key, next_start, False, filters))
+            yield rows
 
-    return rows
 
+def write_table(table: str, api_key: str, out_path: str) -> int:
+    """Stream a table to out_path as gzip-compressed NDJSON. Returns the row count."""
+    tmp_path = f"{out_path}.tmp"
+    count = 0
+    with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+        for page in iter_table_pages(table, api_key):
+            for row in page:
+                f.write(json.dumps(row, ensure_ascii=False))
+                f.write("\n")
+            count += len(page)
+    os.replace(tmp_path, out_path)
+    return count
+
+
+def _replica_connect(path: str = None) -> sqlite3.Connection:
+    conn = sqlite3.connect(path or REPLICA_DB, timeout=30)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS sync_state (
+            table_name TEXT PRIMARY KEY,
+            max_id INTEGER NOT NULL,
+            max_updated_at TEXT
+        )
+        """
+    )
+    for table, columns in REPLICA_INDEXES.items():
+        generated = "".join(
+            f", {col} GENERATED ALWAYS AS (json_extract(data, '$.{col}')) VIRTUAL" for col in columns
+        )
+        conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {table} (id INTEGER PRIMARY KEY, updated_at TEXT, data TEXT NOT NULL{generated})"
+        )
+        for col in columns:
+            conn.execute(f"CREATE INDEX IF NOT EXISTS {table}_{col} ON {table} ({col})")
+    conn.commit()
+    return conn
 
-__all__ = ["download_db"]
 
+def _sync_state(conn: sqlite3.Connection, table: str) -> tuple[int, str | None]:
+    row = conn.execute(
+        "SELECT max_id, max_updated_at FROM sync_state WHERE table_name = ?", (table,)
+    ).fetchone()
+    return (row[0], row[1]) if row else (0, None)
 
-def download_db() -> None:
-    """Download Supabase tables (notes, attendees, profiles) to JSON files."""
+
+def _save_sync_state(conn: sqlite3.Connection, table: str, max_id: int, max_updated_at: str | None) -> None:
+    conn.execute(
+        """
+        INSERT INTO sync_state (table_name, max_id, max_updated_at) VALUES (?, ?, ?)
+        ON CONFLICT (table_name) DO UPDATE SET
+            max_id = excluded.max_id, max_updated_at = excluded.max_updated_at
+        """,
+        (table, max_id, max_updated_at),
+    )
+
+
+def sync_table(conn: sqlite3.Connection, table: str, api_key: str) -> int:
+    """Upsert rows of table added (id > last synced id) or updated since the last sync.
+
+    Updated rows are only detected for tables with an updated_at column.
+    Deletions are not replicated. Returns the number of rows upserted.
+
+    Each page is committed as it arrives, so the write lock is never held
+    across a page fetch and the other tables' syncs can write in between. The
+    id high-water mark is saved with every page (pages come in id order), so an
+    interrupted sync resumes where it stopped; the updated_at mark is only
+    saved once all pages are in, since those pages are not in updated_at order.
+    """
+    max_id, saved_updated_at = _sync_state(conn, table)
+    max_updated_at = saved_updated_at
+    queries = [f"id=gt.{max_id}"]
+    if saved_updated_at is not None:
+        queries.append(f"updated_at=gt.{urllib.parse.quote(saved_updated_at)}")
+
+    upserted = 0
+    missing = set(REPLICA_INDEXES.get(table, ()))
+    for filters in queries:
+        for page in iter_table_pages(table, api_key, filters):
+            if not page:
+                continue
+            conn.executemany(
+                f"""
+                INSERT INTO {table} (id, updated_at, data) VALUES (?, ?, ?)
+                ON CONFLICT (id) DO UPDATE SET updated_at = excluded.updated_at, data = excluded.data
+                """,
+                [(row["id"], row.get("updated_at"), json.dumps(row, ensure_ascii=False)) for row in page],
+            )
+            upserted += len(page)
+            max_id = max(max_id, max(row["id"] for row in page))
+            stamps = [row["updated_at"] for row in page if row.get("updated_at")]
+            if stamps:
+                max_updated_at = max([max_updated_at or "", *stamps])
+            missing = {col for col in missing if not any(col in row for row in page)}
+            _save_sync_state(conn, table, max_id, saved_updated_at)
+            conn.commit()
+
+    _save_sync_state(conn, table, max_id, max_updated_at)
+    conn.commit()
+    if upserted and missing:
+        print(f"Warning: synced {table} rows have no {', '.join(sorted(missing))}; those replica indexes are empty")
+    return upserted
+
+
+def snapshot_replica(out_path: str) -> None:
+    """Copy the replica to out_path with SQLite's online backup."""
+    tmp_path = f"{out_path}.tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    src = _replica_connect()
+    dst = sqlite3.connect(tmp_path)
+    try:
+        src.backup(dst)
+    finally:
+        dst.close()
+        src.close()
+    os.replace(tmp_path, out_path)
+
+
+def sync_replica() -> dict[str, int]:
+    """Bring the local replica up to date for every table. Returns rows upserted per table."""
     api_key = get_api_key()
+    counts = {}
+    # One connection per table, so the tables sync concurrently; sync_table
+    # commits every page, so their writes interleave instead of waiting.
+    def run(table: str) -> int:
+        conn = _replica_connect()
+        try:
+            return sync_table(conn, table, api_key)
+        finally:
+            conn.close()
+
+    with ThreadPoolExecutor(max_workers=len(TABLES)) as pool:
+        futures = {table: pool.submit(run, table) for table in TABLES}
+        for table, future in futures.items():
+            counts[table] = future.result()
+    return counts
+
+
+__all__ = ["download_db"]
+
+
+def download_db(incremental: bool = False) -> None:
+    """Download Supabase tables (notes, attendees, profiles) to .ndjson.gz files.
+
+    With incremental=True, sync the local SQLite replica instead and snapshot it
+    to supabase_replica_{day}.db.
+    """
     day_mod = datetime.now().day % 5
-    for table in TABLES:
-        rows = fetch_table(table, api_key)
-        out_path = f"{table}_{day_mod}.json"
-        with open(out_path, "w") as f:
-            json.dump(rows, f, indent=2)
-        print(f"Wrote {len(rows)} rows to {out_path}")
+    if incremental:
+        for table, rows in sync_replica().items():
+            print(f"Upserted {rows} {table} rows into {REPLICA_DB}")
+        out_path = f"supabase_replica_{day_mod}.db"
+        snapshot_replica(out_path)
+        print(f"Wrote snapshot {out_path}")
+        return
+
+    api_key = get_api_key()
+    with ThreadPoolExecutor(max_workers=len(TABLES)) as pool:
+        futures = {
+            table: pool.submit(write_table, table, api_key, f"{table}_{day_mod}.ndjson.gz")
+            for table in TABLES
+        }
+        for table, future in futures.items():
+            rows = future.result()
+            print(f"Wrote {rows} rows to {table}_{day_mod}.ndjson.gz")
 
 
 if __name__ == "__main__":
-    download_db()
+    parser = argparse.ArgumentParser(description="Download Supabase tables")
+    parser.add_argument("--incremental", action="store_true", help="sync the SQLite replica instead")
+    download_db(parser.parse_args().incremental)
@@ -1,6 +1,9 @@
 import json
-import os
 
+import kv_cache
+import name_index
+import request_log
+import tracing
 from meetgeek import get_transcript
 from groq import get_groq_response
 from contact_loader import load_full
@@ -9,40 +12,28 @@ from contact_loader import load_full
 NAMES_CACHE_FILE = "names_cache.json"
 IDS_CACHE_FILE = "ids_cache.json"
 
+# Only this many of the most similar contacts per extracted name go to the LLM.
+TOP_K = 5
 
-def _load_cache(path: str) -> dict:
-    """Load a JSON cache from disk."""
-    if not os.path.exists(path):
-        return {}
-    try:
-        with open(path, "r", encoding="utf-8") as f:
-            return json.load(f)
-    except (json.JSONDecodeError, OSError):
-        # If cache is corrupted or unreadable, ignore it.
-        return {}
+# Names resolved locally with at least this confidence skip the LLM.
+RESOLVE_THRESHOLD = 0.8
 
-
-def _save_cache(cache: dict, path: str) -> None:
-    """Persist a JSON cache to disk."""
-    try:
-        with open(path, "w", encoding="utf-8") as f:
-            json.dump(cache, f, indent=2, ensure_ascii=False)
-    except OSError:
-        # Failing to write cache should not break main flow.
-        pass
+# Legacy JSON caches are imported into the key-value cache the first time it is opened.
+names_cache = kv_cache.open_cache("names", migrate_from=NAMES_CACHE_FILE)
+ids_cache = kv_cache.open_cache("ids", migrate_from=IDS_CACHE_FILE)
 
 
 def generate_names(transcript_id: str) -> str:
     """
     Generate (or retrieve cached) names for a meeting transcript.
 
-    Uses a local JSON cache `names_cache.json` keyed by transcript/meeting id.
+    Uses the `names` key-value cache keyed by transcript/meeting id.
     """
-    cache = _load_cache(NAMES_CACHE_FILE)
-
     # Check cache before doing any transcript / LLM work.
-    if transcript_id in cache:
-        return cache[transcript_id]
+    cached = names_cache.get(transcript_id)
+    tracing.set_attributes(names_cache_hit=cached is not None)
+    if cached is not None:
+        return cached
 
     transcript = get_transcript(transcript_id)
     attendees = transcript["attendees"]
@@ -69,63 +60,75 @@ def generate_names(transcript_id: str) -> str:
     response = json.loads(response)
 
     # Store in cache indexed on meeting/transcript id.
-    cache[transcript_id] = response
-    _save_cache(cache, NAMES_CACHE_FILE)
+    names_cache.set(transcript_id, response)
 
     return response
 
-def similar_names(name1, name2):
-    """Return True if any word from name1 is similar to any word from name2 (word contained in word, case-insensitive)."""
-    words1 = [w for w in name1.strip().lower().split() if w]
-    words2 = [w for w in name2.strip().lower().split() if w]
-    if not words1 or not words2:
-        return False
-    # remove any word less than 2 characters
-    words1 = [w for w in words1 if len(w) > 2]
-    words2 = [w for w in words2 if len(w) > 2]
-    for w1 in words1:
-        for w2 in words2:
-            shorter, longer = (w1, w2) if len(w1) <= len(w2) else (w2, w1)
-            if shorter in longer:
-                return True
-    return False
-
-def filter_names(names,master_list):
-    # iterate through masster_list
-    shorter_list = []
-    for item in master_list:
-        for name in names:
-            if similar_names(item['name'], name):
-                shorter_list.append(item)
-                break
-    return shorter_list
-
-def generate_ids(transcript_id: str) -> list[str]:
-    # First, check the local cache for existing IDs.
-    ids_cache = _load_cache(IDS_CACHE_FILE)
-    if transcript_id in ids_cache:
-        return ids_cache[transcript_id]
-
-    names_ = generate_names(transcript_id)
+def _match_ids_with_llm(transcript_id: str, names_: list[str], index: name_index.NameIndex) -> list[dict]:
+    """Ask the LLM to map names to hubspot ids among the top-ranked candidates."""
+    if not names_:
+        return []
+    candidates, similar_count = index.top_k(names_, TOP_K)
+    if not candidates:
+        return []
     names = json.dumps(names_)
-    print(names_)
-    full = load_full()
-    filtered_full = filter_names(names_,full)
     system_prompt = (
         f"Consider this list: {names}. You will map each name to one andn only on hubspot id based on "
         "the information you are provided that assocates names with hubspot ids. If "
         "names might not match exactly in which case accept a close match.  If there is no reasonable match, output null for the hubspot_id. You will output a json "
         "list of FULL NAMES from the mapping data and their hubspot ids. there will be two keys: name and hubspot_id. output pure json, no markdown or other text."
     )
+    user_prompt = json.dumps(candidates)
+    tracing.set_attributes(
+        candidates=len(candidates), similar=similar_count, prompt_chars=len(system_prompt) + len(user_prompt)
+    )
+    request_log.log(
+        "generate_ids prompt",
+        meeting_id=transcript_id,
+        candidates=len(candidates),
+        similar=similar_count,
+        prompt_chars=len(system_prompt) + len(user_prompt),
+    )
     response = get_groq_response(
         system_prompt=system_prompt,
-        user_prompt=json.dumps(filtered_full),
+        user_prompt=user_prompt,
     )
     response = json.loads(response)
-    response = [entry for entry in response if entry["hubspot_id"] is not None]
+    return [entry for entry in response if entry["hubspot_id"] is not None]
 
-    # Store in cache indexed on meeting/transcript id.
-    ids_cache[transcript_id] = response
-    _save_cache(ids_cache, IDS_CACHE_FILE)
 
-    return response
\ No newline at end of file
+def forget(transcript_id: str) -> None:
+    """Drop the cached names and ids of a meeting, e.g. after its transcript changed."""
+    names_cache.delete(transcript_id)
+    ids_cache.delete(transcript_id)
+
+
+def generate_ids(transcript_id: str) -> list[str]:
+    with tracing.span("generate_ids", meeting_id=transcript_id) as span:
+        # First, check the local cache for existing IDs.
+        cached = ids_cache.get(transcript_id)
+        span.set(ids_cache_hit=cached is not None)
+        if cached is not None:
+            return cached
+
+        with tracing.span("generate_names") as stage:
+            names_ = generate_names(transcript_id)
+            stage.set(names=len(names_))
+        with tracing.span("load_full") as stage:
+            full = load_full()
+            index = name_index.index_for(full)
+            stage.set(contacts=len(full))
+        # Confident local matches need no LLM call; only the leftovers go to Groq.
+        resolved, unresolved = index.resolve_all(names_, RESOLVE_THRESHOLD)
+        span.set(resolved=len(resolved), unresolved=len(unresolved))
+        request_log.log("generate_ids resolved", meeting_id=transcript_id, resolved=len(resolved), names=len(names_))
+        with tracing.span("match_ids_with_llm"):
+            matched = _match_ids_with_llm(transcript_id, unresolved, index)
+        known = {entry["hubspot_id"] for entry in resolved}
+        response = resolved + [entry for entry in matched if entry["hubspot_id"] not in known]
+        span.set(ids=len(response))
+
+        # Store in cache indexed on meeting/transcript id.
+        ids_cache.set(transcript_id, response)
+
+        return response
\ No newline at end of file
@@ -1,51 +1,121 @@
 """
 Call Groq chat completions API directly.
 Set GROQ_API_KEY in the environment.
+
+Responses can be cached, keyed by a hash of (model, system prompt, user
+prompt, parameters), so identical requests are answered locally. Caching is
+opt-in: pass cache=True, or set GROQ_CACHE=1 to enable it by default.
 """
+import hashlib
 import json
 import os
-import urllib.error
-import urllib.request
+import threading
+
+import http_client
+import kv_cache
+import metrics
+import tracing
 
 GROQ_API_KEY = (os.environ.get("GROQ_API_KEY") or "").strip().strip('"').strip("'")
 CHAT_URL = "https://api.groq.com/openai/v1/chat/completions"
 DEFAULT_MODEL = "openai/gpt-oss-120b"
 
+CACHE_BY_DEFAULT = os.environ.get("GROQ_CACHE", "").lower() in ("1", "true", "yes")
+CACHE_TTL = int(os.environ.get("GROQ_CACHE_TTL", 30 * 24 * 3600))
+CACHE_MAX_ENTRIES = int(os.environ.get("GROQ_CACHE_MAX_ENTRIES", 5000))
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def _response_cache():
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = kv_cache.open_cache("groq", max_entries=CACHE_MAX_ENTRIES, ttl=CACHE_TTL)
+        return _cache
+
+
+def _cache_key(model: str, messages: list[dict], params: dict) -> str:
+    raw = json.dumps({"model": model, "messages": messages, "params": params}, sort_keys=True)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def _cache_lookup(key: str, use_cache: bool, bypass: bool) -> str | None:
+    """Return the cached content for key, counting the hit or miss."""
+    if not use_cache:
+        return None
+    content = None if bypass else _response_cache().get(key)
+    metrics.groq_cache_requests.inc(result="miss" if content is None else "hit")
+    return content
+
+
+def _headers() -> dict:
+    return {
+        "Authorization": f"Bearer {GROQ_API_KEY}",
+        "User-Agent": "curl/7.68.0",
+    }
+
+
+def _api_error(e: http_client.HttpError) -> http_client.HttpError:
+    """Rewrite an HTTP error to carry Groq's own error message, if it sent one."""
+    if e.status is None:
+        return e
+    try:
+        msg = json.loads(e.body).get("error", {}).get("message", e.body)
+    except (json.JSONDecodeError, AttributeError):
+        msg = e.body
+    return http_client.HttpError(f"Groq API error {e.status}: {msg}", e.status, e.body, e.url)
+
+
 def get_groq_response(
     system_prompt: str,
     user_prompt: str,
     model: str = DEFAULT_MODEL,
+    cache: bool | None = None,
+    bypass: bool = False,
 ) -> str:
-    """Call Groq chat completions and return the assistant message content."""
+    """Call Groq chat completions and return the assistant message content.
+
+    With cache (default GROQ_CACHE), an identical earlier response is returned
+    without calling Groq. bypass skips the lookup but still stores the new
+    response.
+    """
     messages = [
         {"role": "system", "content": system_prompt},
         {"role": "user", "content": user_prompt},
     ]
-    body = json.dumps({"model": model, "messages": messages}).encode("utf-8")
-    req = urllib.request.Request(
-        CHAT_URL,
-        data=body,
-        method="POST",
-        headers={
-            "Authorization": f"Bearer {GROQ_API_KEY}",
-            "Content-Type": "application/json",
-            "User-Agent": "curl/7.68.0",
-        },
-    )
+    use_cache = CACHE_BY_DEFAULT if cache is None else cache
+    with tracing.span("groq", model=model, prompt_chars=len(system_prompt) + len(user_prompt)) as span:
+        content = _complete(model, messages, use_cache, bypass)
+        span.set(response_chars=len(content))
+    return content
+
+
+def _cache_result(use_cache: bool, cached: str | None) -> str:
+    """The cache attribute for a trace span: "off", "hit" or "miss"."""
+    if not use_cache:
+        return "off"
+    return "hit" if cached is not None else "miss"
+
+
+def _complete(model: str, messages: list[dict], use_cache: bool, bypass: bool) -> str:
+    key = _cache_key(model, messages, {})
+    cached = _cache_lookup(key, use_cache, bypass)
+    tracing.set_attributes(cache=_cache_result(use_cache, cached))
+    if cached is not None:
+        return cached
 
     try:
-        with urllib.request.urlopen(req) as resp:
-            data = json.loads(resp.read().decode())
-    except urllib.error.HTTPError as e:
-        body = e.read().decode()
-        try:
-            err = json.loads(body)
-            msg = err.get("error", {}).get("message", body)
-        except json.JSONDecodeError:
-            msg = body
-        raise RuntimeError(f"Groq API error {e.code}: {msg}") from e
-    except urllib.error.URLError as e:
-        raise RuntimeError(f"Groq request failed: {e}") from e
+        data = http_client.request_json(
+            "POST",
+            CHAT_URL,
+            headers=_headers(),
+            payload={"model": model, "messages": messages},
+            service="Groq",
+        )
+    except http_client.HttpError as e:
+        raise _api_error(e) from e
 
     choices = data.get("choices")
     if not choices:
@@ -53,4 +123,77 @@ def get_groq_response(
     content = choices[0].get("message", {}).get("content")
     if content is None:
         raise RuntimeError("Groq response had no message content")
-    return content.strip()
\ No newline at end of file
+    content = content.strip()
+    if use_cache:
+        _response_cache().set(key, content)
+    return content
+
+
+def stream_groq_response(
+    system_prompt: str,
+    user_prompt: str,
+    model: str = DEFAULT_MODEL,
+    cache: bool | None = None,
+    bypass: bool = False,
+):
+    """Call Groq chat completions with streaming and yield the content as it is generated.
+
+    Shares the response cache with get_groq_response: a hit is yielded in one
+    piece, and a completed stream is stored.
+    """
+    messages = [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": user_prompt},
+    ]
+    use_cache = CACHE_BY_DEFAULT if cache is None else cache
+    key = _cache_key(model, messages, {})
+    span = tracing.start_span("groq_stream", model=model, prompt_chars=len(system_prompt) + len(user_prompt))
+    try:
+        yield from _stream(model, messages, key, use_cache, bypass, span)
+    except BaseException as e:
+        span.set(error=f"{type(e).__name__}: {e}")
+        raise
+    finally:
+        tracing.finish(span)
+
+
+def _stream(model: str, messages: list[dict], key: str, use_cache: bool, bypass: bool, span):
+    cached = _cache_lookup(key, use_cache, bypass)
+    span.set(cache=_cache_result(use_cache, cached))
+    if cached is not None:
+        span.set(response_chars=len(cached))
+        yield cached
+        return
+
+    parts: list[str] = []
+    body = json.dumps({"model": model, "messages": messages, "stream": True}).encode("utf-8")
+    headers = {**_headers(), "Content-Type": "application/json", "Accept": "text/event-stream"}
+    try:
+        lines = http_client.stream_lines(
+            "POST", CHAT_URL, headers=headers, body=body, service="Groq", until="data: [DONE]"
+        )
+        for line in lines:
+            # Server-sent events: payload lines start with "data: "; others are
+            # blank separators or comments. The stream ends at "data: [DONE]".
+            if not line.startswith("data:"):
+                continue
+            payload = line[len("data:"):].strip()
+            chunk = json.loads(payload)
+            if "error" in chunk:
+                raise RuntimeError(f"Groq stream error: {chunk['error'].get('message', chunk['error'])}")
+            choices = chunk.get("choices") or []
+            if not choices:
+                continue
+            content = (choices[0].get("delta") or {}).get("content")
+            if not parts:
+                # Match the stripped text get_groq_response and the cache return.
+                content = (content or "").lstrip()
+            if content:
+                parts.append(content)
+                yield content
+    except http_client.HttpError as e:
+        raise _api_error(e) from e
+    content = "".join(parts).strip()
+    span.set(response_chars=len(content))
+    if use_cache:
+        _response_cache().set(key, content)
@@ -1,19 +1,87 @@
-from flask import Flask, jsonify, request
+import gzip
+import hashlib
+import hmac
+import json
+import os
+import time
+from functools import wraps
+
+from flask import Blueprint, Flask, Response, current_app, g, jsonify, request, stream_with_context
 from generate_ids import generate_ids
 from contact_loader import load_full, load_short
-from supa_from_id import supa_from_id as supa_from_id_func, summarize_transcript
-from meetgeek import get_all_meetings, get_transcript
+from supa_from_id import supa_from_id as supa_from_id_func, summarize_transcript, stream_summary
+from meetgeek import get_transcript, list_meetings
+from supa import existing_ids
 from download_db import download_db as download_db_func
-app = Flask(__name__)
+import job_queue
+import metrics
+import request_log
+import tracing
+
+api = Blueprint("api", __name__)
 
 ALLOWED_ORIGINS = {"http://localhost:5173", "https://api.tammer.com", "https://antler.tammer.com"}
+# Bearer token for the internal routes (/traces, /jobs); unset, they answer 403.
+INTERNAL_API_TOKEN = os.environ.get("INTERNAL_API_TOKEN")
+
+def log(message, **fields):
+    request_log.log(message, **fields)
+
+def process_meeting(meeting_id):
+    """Job handler for queued webhook meetings; returns the note summary stored on the job."""
+    request_log.start_request(f"job-{meeting_id}")
+    try:
+        result = supa_from_id_func(meeting_id)
+        log("result", result=result)
+    finally:
+        request_log.end_request()
+    if result is None:
+        return None
+    return {"note_id": result["note_id"], "ids": result["ids"]}
+
+
+@api.before_app_request
+def start_job_workers():
+    # Started lazily so the debug reloader's parent process runs no workers.
+    job_queue.start_workers(process_meeting)
 
-def log(message):
-    with open("log.txt", "a") as f:
-        from datetime import datetime
-        f.write(f"{datetime.now().isoformat()} {message}\n")
 
-@app.after_request
+@api.before_app_request
+def start_request_log():
+    g.started = time.perf_counter()
+    # The request id is also the trace id, so it is always ours; a caller's
+    # own id is only logged, to correlate with their side.
+    request_log.start_request()
+    client_request_id = request.headers.get("X-Request-Id")
+    if client_request_id:
+        log("request", client_request_id=client_request_id[:128])
+
+
+@api.after_app_request
+def time_request(response):
+    started = g.get("started")
+    if started is not None:
+        route = request.url_rule.rule if request.url_rule else "unmatched"
+        metrics.http_request_seconds.observe(
+            time.perf_counter() - started, route=route, method=request.method, status=str(response.status_code)
+        )
+    return response
+
+
+@api.teardown_app_request
+def end_request_log(exc):
+    request_log.end_request()
+
+
+@api.after_app_request
+def request_id_header(response):
+    request_id = request_log.current_request_id()
+    if request_id:
+        response.headers["X-Request-Id"] = request_id
+    return response
+
+
+@api.after_app_request
 def cors_headers(response):
     origin = request.headers.get("Origin")
     if origin in ALLOWED_ORIGINS:
@@ -21,24 +89,63 @@ def cors_headers(response):
     return response
 
 
-@app.route("/full", methods=["GET"])
+# route -> (contact snapshot, JSON bytes, gzipped JSON bytes, etag)
+_encoded_contacts: dict[str, tuple[list[dict], bytes, bytes, str]] = {}
+
+
+def encode_contacts(route: str, contacts: list[dict]) -> tuple[list[dict], bytes, bytes, str]:
+    """Return (contacts, JSON bytes, gzipped JSON bytes, etag), encoding once per snapshot."""
+    cached = _encoded_contacts.get(route)
+    if cached is None or cached[0] is not contacts:
+        body = current_app.json.dumps(contacts).encode("utf-8")
+        cached = (contacts, body, gzip.compress(body), hashlib.sha1(body).hexdigest())
+        _encoded_contacts[route] = cached
+    return cached
+
+
+def _contacts_response(route: str, contacts: list[dict]) -> Response:
+    """Serve a contact snapshot from bytes encoded once per snapshot.
+
+    contact_loader returns the same list object until the contacts change, so
+    the JSON, its gzip variant and the ETag are only recomputed then. The
+    gzip variant's ETag gets a "-gz" suffix, as a strong validator must
+    differ between encodings.
+    """
+    _, body, gzipped, etag = encode_contacts(route, contacts)
+    use_gzip = request.accept_encodings["gzip"] > 0
+    if use_gzip:
+        etag += "-gz"
+
+    if etag in request.if_none_match:
+        response = Response(status=304)
+    elif use_gzip:
+        response = Response(gzipped, mimetype="application/json")
+        response.headers["Content-Encoding"] = "gzip"
+    else:
+        response = Response(body, mimetype="application/json")
+    response.set_etag(etag)
+    response.vary.add("Accept-Encoding")
+    return response
+
+
+@api.route("/full", methods=["GET"])
 def full():
-    return jsonify(load_full())
+    return _contacts_response("full", load_full())
 
 
-@app.route("/short", methods=["GET"])
+@api.route("/short", methods=["GET"])
 def short():
-    return jsonify(load_short())
+    return _contacts_response("short", load_short())
 
 
-@app.route("/ids", methods=["GET"])
+@api.route("/ids", methods=["GET"])
 def ids():
     # id is a parameter
     meeting_id = request.args.get("meeting_id")
     return generate_ids(meeting_id)
 
 
-@app.route("/supa_from_id", methods=["GET"])
+@api.route("/supa_from_id", methods=["GET"])
 def supa_from_id():
     meeting_id = request.args.get("meeting_id")
     verbose = request.args.get("verbose")
@@ -48,24 +155,63 @@ def supa_from_id():
     return "", 200
 
 
-@app.route("/summary_from_id", methods=["GET"])
+def _stream_summary_plain(meeting_id, refresh):
+    try:
+        for kind, data in stream_summary(meeting_id, refresh):
+            if kind == "text":
+                yield data
+    except Exception as e:
+        yield f"\n\nFailed to generate summary: {str(e)}\n"
+
+
+def _stream_summary_sse(meeting_id, refresh):
+    try:
+        for kind, data in stream_summary(meeting_id, refresh):
+            if kind == "text":
+                yield f"data: {json.dumps({'text': data})}\n\n"
+            else:
+                yield f"event: done\ndata: {json.dumps({'ids': data})}\n\n"
+    except Exception as e:
+        yield f"event: error\ndata: {json.dumps({'error': f'Failed to generate summary: {str(e)}'})}\n\n"
+
+
+@api.route("/summary_from_id", methods=["GET"])
 def summary_from_id():
+    """Summary of a meeting as JSON, or streamed with ?stream=1 (markdown text) or ?stream=sse.
+
+    ?refresh=1 regenerates the summary instead of using a cached LLM response.
+    """
     meeting_id = request.args.get("meeting_id")
     if not meeting_id:
         return jsonify({"error": "missing meeting_id"}), 400
+    refresh = bool(request.args.get("refresh"))
+    stream = request.args.get("stream")
+    if stream:
+        if stream == "sse":
+            body, mimetype = _stream_summary_sse(meeting_id, refresh), "text/event-stream"
+        else:
+            body, mimetype = _stream_summary_plain(meeting_id, refresh), "text/markdown"
+        response = Response(stream_with_context(body), mimetype=mimetype)
+        response.headers["Cache-Control"] = "no-cache"
+        # Keep reverse proxies from buffering the stream.
+        response.headers["X-Accel-Buffering"] = "no"
+        return response
     try:
-        result = summarize_transcript(meeting_id)
+        result = summarize_transcript(meeting_id, refresh)
     except Exception as e:
         return jsonify({"error": f"Failed to generate summary: {str(e)}"}), 500
     return jsonify(result)
 
 
-@app.route("/get_all_meetings", methods=["GET"])
-def get_all_meetings_route():
-    try:
-        meetings = get_all_meetings()
-    except Exception as e:
-        return jsonify({"error": f"Failed to fetch meetings: {str(e)}"}), 500
+# (etag, formatted listing) for the last meeting listing served.
+_formatted_meetings: tuple[str, list[dict]] | None = None
+
+
+def _format_meetings(meetings: list[dict], etag: str) -> list[dict]:
+    global _formatted_meetings
+    cached = _formatted_meetings
+    if cached is not None and cached[0] == etag:
+        return cached[1]
 
     formatted = []
     for m in meetings:
@@ -77,11 +223,40 @@ def get_all_meetings_route():
         title = m.get("title") or ""
         name = f"{title} {dt} {meeting_id}".strip()
         formatted.append({"meeting_id": meeting_id, "name": name})
+    _formatted_meetings = (etag, formatted)
+    return formatted
+
 
-    return jsonify(formatted)
+def _with_notes(formatted: list[dict], etag: str) -> tuple[list[dict], str]:
+    """Flag each listed meeting with has_note, from one bulk existing_ids lookup.
+
+    The ETag also covers which meetings have notes, so a new note changes it.
+    """
+    found = existing_ids([m["meeting_id"] for m in formatted])
+    digest = hashlib.sha1("\n".join(sorted(found)).encode("utf-8")).hexdigest()[:16]
+    return [{**m, "has_note": m["meeting_id"] in found} for m in formatted], f"{etag}-{digest}"
+
+
+@api.route("/get_all_meetings", methods=["GET"])
+def get_all_meetings_route():
+    with_notes = request.args.get("with_notes", "").lower() in ("1", "true", "yes")
+    try:
+        meetings, etag = list_meetings()
+        formatted = _format_meetings(meetings, etag)
+        if with_notes:
+            formatted, etag = _with_notes(formatted, etag)
+    except Exception as e:
+        return jsonify({"error": f"Failed to fetch meetings: {str(e)}"}), 500
+
+    if etag in request.if_none_match:
+        response = Response(status=304)
+    else:
+        response = jsonify(formatted)
+    response.set_etag(etag)
+    return response
 
 
-@app.route("/get_transcript", methods=["GET"])
+@api.route("/get_transcript", methods=["GET"])
 def get_transcript_route():
     meeting_id = request.args.get("meeting_id")
     if not meeting_id:
@@ -92,29 +267,70 @@ def get_transcript_route():
         return jsonify({"error": f"Failed to fetch transcript: {str(e)}"}), 500
     return jsonify(result)
 
-@app.route("/supa_from_meetgeek", methods=["POST"])
+@api.route("/supa_from_meetgeek", methods=["POST"])
 def supa_from_meetgeek():
     log("supa_from_meetgeek")
     body = request.get_json(silent=True) or {}
-    log(f"body: {body}")
+    log("body", body=body)
     meeting_id = body.get("meeting_id")
-    log(f"meeting_id: {meeting_id}")
+    log("meeting_id", meeting_id=meeting_id)
     if not meeting_id:
         log("missing meeting_id, exiting")
         return jsonify({"error": "missing meeting_id"}), 400
-    try:
-        result = supa_from_id_func(meeting_id)
-        log(f"result: {result}")
-    except Exception as e:
-        return jsonify({"error": f"Failed to process meeting: {str(e)}"}), 500
-    if result is None:
-        return "", 200
-    return "", 200
+    job = job_queue.enqueue(meeting_id)
+    log("job", status=job["status"])
+    return jsonify(job), 202
+
+
+@api.route("/metrics", methods=["GET"])
+def metrics_route():
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
+
+def internal(route):
+    """Answer 403 unless the request carries INTERNAL_API_TOKEN as a bearer token."""
+    @wraps(route)
+    def wrapper(*args, **kwargs):
+        supplied = request.headers.get("Authorization", "").removeprefix("Bearer ")
+        if not INTERNAL_API_TOKEN or not hmac.compare_digest(supplied, INTERNAL_API_TOKEN):
+            return "", 403
+        return route(*args, **kwargs)
+    return wrapper
 
-@app.route("/download_db", methods=["GET"])
+
+@api.route("/traces/<trace_id>", methods=["GET"])
+@internal
+def trace(trace_id):
+    """Spans of one trace; the trace id of a request is the X-Request-Id we answered with, of a queued job "job-<meeting_id>"."""
+    spans = tracing.get_trace(trace_id)
+    if not spans:
+        return jsonify({"error": "unknown trace_id"}), 404
+    return jsonify(spans)
+
+
+@api.route("/jobs/<meeting_id>", methods=["GET"])
+@internal
+def job_status(meeting_id):
+    job = job_queue.get_job(meeting_id)
+    if job is None:
+        return jsonify({"error": "unknown meeting_id"}), 404
+    return jsonify(job)
+
+@api.route("/download_db", methods=["GET"])
 def download_db():
-    download_db_func()
+    download_db_func(incremental=bool(request.args.get("incremental")))
     return "", 403 # forbidden because we don't want to expose this to the world
 
-app.run(debug=True)
+
+def create_app() -> Flask:
+    """Build the Flask app. serve.py runs it under gunicorn for production."""
+    app = Flask(__name__)
+    app.register_blueprint(api)
+    return app
+
+
+app = create_app()
+
+if __name__ == "__main__":
+    app.run(debug=True)
 
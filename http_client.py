@@ -0,0 +1,300 @@
+"""
+Shared HTTP client for the upstream APIs (MeetGeek, HubSpot, Supabase, Groq).
+
+Connections are kept alive in a small pool per (scheme, host, port), so a
+paginated fetch reuses one TCP+TLS connection instead of handshaking for
+every page. Responses are requested gzip-compressed and decoded here.
+
+set_host_limit() caps how many requests may be in flight to one host at a
+time across all threads, e.g. to stay under an upstream's rate limit while a
+backfill runs many meetings concurrently.
+
+Each request is recorded in metrics (latency, status, bytes) under an
+upstream label taken from its service name.
+
+Every failure is raised as HttpError, a RuntimeError whose message reads
+"<service> API error <status>: <body>" for HTTP errors or
+"<service> request failed: <reason>" when no response was received.
+"""
+import gzip
+import http.client
+import json
+import os
+import threading
+import time
+import urllib.parse
+
+import metrics
+
+
+DEFAULT_TIMEOUT = float(os.environ.get("HTTP_TIMEOUT", 60))
+POOL_SIZE = int(os.environ.get("HTTP_POOL_SIZE", 8))
+MAX_REDIRECTS = 5
+
+# Errors that mean a pooled keep-alive connection was closed by the server.
+# The request is retried on a new connection if it never got through, or if
+# it is idempotent; a POST that may have reached the server is not resent.
+_IDEMPOTENT_METHODS = ("GET", "HEAD", "OPTIONS")
+_STALE_ERRORS = (
+    http.client.RemoteDisconnected,
+    http.client.CannotSendRequest,
+    ConnectionResetError,
+    BrokenPipeError,
+)
+
+
+class HttpError(RuntimeError):
+    """An upstream request failed. status is None if no response was received."""
+
+    def __init__(self, message: str, status: int | None = None, body: str = "", url: str = ""):
+        super().__init__(message)
+        self.status = status
+        self.body = body
+        self.url = url
+
+
+class Response:
+    def __init__(self, status: int, headers: http.client.HTTPMessage, body: bytes):
+        self.status = status
+        self.headers = headers
+        self.body = body
+
+    def text(self) -> str:
+        return self.body.decode()
+
+    def json(self):
+        return json.loads(self.body.decode())
+
+
+_pools: dict[tuple[str, str, int], list[http.client.HTTPConnection]] = {}
+_pools_lock = threading.Lock()
+
+_host_limits: dict[str, threading.BoundedSemaphore] = {}
+
+
+def set_host_limit(host: str, limit: int | None) -> None:
+    """Allow at most limit concurrent requests to host (None removes the limit)."""
+    if limit is None:
+        _host_limits.pop(host, None)
+    else:
+        _host_limits[host] = threading.BoundedSemaphore(limit)
+
+
+def _pool_key(parts: urllib.parse.SplitResult) -> tuple[str, str, int]:
+    default_port = 443 if parts.scheme == "https" else 80
+    return parts.scheme, parts.hostname, parts.port or default_port
+
+
+def _checkout(key: tuple[str, str, int], timeout: float) -> tuple[http.client.HTTPConnection, bool]:
+    """Return (connection, reused) for key, preferring an idle pooled one."""
+    with _pools_lock:
+        idle = _pools.get(key)
+        if idle:
+            conn = idle.pop()
+            conn.timeout = timeout
+            if conn.sock is not None:
+                conn.sock.settimeout(timeout)
+            return conn, True
+    scheme, host, port = key
+    if scheme == "https":
+        return http.client.HTTPSConnection(host, port, timeout=timeout), False
+    return http.client.HTTPConnection(host, port, timeout=timeout), False
+
+
+def _checkin(key: tuple[str, str, int], conn: http.client.HTTPConnection) -> None:
+    with _pools_lock:
+        idle = _pools.setdefault(key, [])
+        if len(idle) < POOL_SIZE:
+            idle.append(conn)
+            return
+    conn.close()
+
+
+def reset() -> None:
+    """Close every pooled connection, e.g. after forking a worker process."""
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for idle in pools:
+        for conn in idle:
+            conn.close()
+
+
+def _open(method, parts, headers, body, timeout):
+    """Send one request on a pooled connection and return (connection, response) once headers arrive."""
+    key = _pool_key(parts)
+    path = parts.path or "/"
+    if parts.query:
+        path += "?" + parts.query
+    while True:
+        conn, reused = _checkout(key, timeout)
+        sent = False
+        try:
+            conn.request(method, path, body=body, headers=headers)
+            sent = True
+            return conn, conn.getresponse()
+        except _STALE_ERRORS:
+            conn.close()
+            if reused and (not sent or method in _IDEMPOTENT_METHODS):
+                continue
+            raise
+        except BaseException:
+            conn.close()
+            raise
+
+
+def _release(parts, conn, resp) -> None:
+    """Return a fully read connection to the pool unless the server is closing it."""
+    if resp.will_close:
+        conn.close()
+    else:
+        _checkin(_pool_key(parts), conn)
+
+
+def _send(method, parts, headers, body, timeout):
+    """Send one request and return (status, headers, raw body)."""
+    conn, resp = _open(method, parts, headers, body, timeout)
+    try:
+        data = resp.read()
+    except BaseException:
+        conn.close()
+        raise
+    _release(parts, conn, resp)
+    return resp.status, resp.headers, data
+
+
+def _record(service: str, method: str, status, started: float, sent: int, received: int) -> None:
+    upstream = metrics.upstream_label(service)
+    metrics.upstream_requests.inc(upstream=upstream, method=method, status=str(status))
+    metrics.upstream_seconds.observe(time.perf_counter() - started, upstream=upstream)
+    if sent:
+        metrics.upstream_sent_bytes.inc(sent, upstream=upstream)
+    if received:
+        metrics.upstream_received_bytes.inc(received, upstream=upstream)
+
+
+def request(
+    method: str,
+    url: str,
+    headers: dict | None = None,
+    body: bytes | None = None,
+    timeout: float | None = None,
+    service: str = "HTTP",
+) -> Response:
+    """Send a request and return the Response, raising HttpError for status >= 400."""
+    headers = {"Accept-Encoding": "gzip", **(headers or {})}
+    timeout = DEFAULT_TIMEOUT if timeout is None else timeout
+
+    for _ in range(MAX_REDIRECTS + 1):
+        parts = urllib.parse.urlsplit(url)
+        limit = _host_limits.get(parts.hostname)
+        started = time.perf_counter()
+        try:
+            if limit is None:
+                status, resp_headers, data = _send(method, parts, headers, body, timeout)
+            else:
+                with limit:
+                    status, resp_headers, data = _send(method, parts, headers, body, timeout)
+        except (OSError, http.client.HTTPException) as e:
+            _record(service, method, "error", started, len(body or b""), 0)
+            raise HttpError(f"{service} request failed: {e}", url=url) from e
+        _record(service, method, status, started, len(body or b""), len(data))
+
+        if resp_headers.get("Content-Encoding", "").lower() == "gzip":
+            data = gzip.decompress(data)
+
+        location = resp_headers.get("Location")
+        if status in (301, 302, 303, 307, 308) and location:
+            url = urllib.parse.urljoin(url, location)
+            if status == 303 or (status in (301, 302) and method == "POST"):
+                method, body = "GET", None
+            continue
+
+        if status >= 400:
+            text = data.decode(errors="replace")
+            raise HttpError(f"{service} API error {status}: {text}", status=status, body=text, url=url)
+        return Response(status, resp_headers, data)
+
+    raise HttpError(f"{service} request failed: too many redirects", url=url)
+
+
+def request_json(
+    method: str,
+    url: str,
+    headers: dict | None = None,
+    payload=None,
+    timeout: float | None = None,
+    service: str = "HTTP",
+):
+    """Send payload (if any) as a JSON body and return the decoded JSON response."""
+    body = None
+    if payload is not None:
+        body = json.dumps(payload).encode("utf-8")
+        headers = {"Content-Type": "application/json", **(headers or {})}
+    return request(method, url, headers=headers, body=body, timeout=timeout, service=service).json()
+
+
+def stream_lines(
+    method: str,
+    url: str,
+    headers: dict | None = None,
+    body: bytes | None = None,
+    timeout: float | None = None,
+    service: str = "HTTP",
+    until: str | None = None,
+):
+    """Send a request and yield the response body line by line as it arrives.
+
+    Meant for server-sent event streams, so the body is requested uncompressed
+    and redirects are not followed. A line equal to until (e.g. "data: [DONE]")
+    ends the stream: it is not yielded, and the rest of the body is drained so
+    the stream counts as finished. The connection only goes back to the pool
+    if the body was read to the end.
+    """
+    headers = {"Accept-Encoding": "identity", **(headers or {})}
+    timeout = DEFAULT_TIMEOUT if timeout is None else timeout
+    parts = urllib.parse.urlsplit(url)
+    limit = _host_limits.get(parts.hostname)
+    if limit is not None:
+        limit.acquire()
+    started = time.perf_counter()
+    sent = len(body or b"")
+    try:
+        try:
+            conn, resp = _open(method, parts, headers, body, timeout)
+        except (OSError, http.client.HTTPException) as e:
+            _record(service, method, "error", started, sent, 0)
+            raise HttpError(f"{service} request failed: {e}", url=url) from e
+
+        if resp.status >= 400:
+            try:
+                text = resp.read().decode(errors="replace")
+            except (OSError, http.client.HTTPException):
+                text = ""
+            conn.close()
+            _record(service, method, resp.status, started, sent, len(text))
+            raise HttpError(f"{service} API error {resp.status}: {text}", status=resp.status, body=text, url=url)
+
+        finished = False
+        received = 0
+        try:
+            for raw in resp:
+                received += len(raw)
+                line = raw.decode("utf-8").rstrip("\r\n")
+                if until is not None and line == until:
+                    received += len(resp.read())
+                    break
+                yield line
+            finished = True
+        except (OSError, http.client.HTTPException) as e:
+            raise HttpError(f"{service} request failed: {e}", url=url) from e
+        finally:
+            # A stream cut off, or abandoned by the caller, counts as an error.
+            _record(service, method, resp.status if finished else "error", started, sent, received)
+            if finished:
+                _release(parts, conn, resp)
+            else:
+                conn.close()
+    finally:
+        if limit is not None:
+            limit.release()
@@ -1,10 +1,10 @@
 """
 Fetch all HubSpot contacts owned by a specific user via the HubSpot CRM Search API.
 """
-import json
 import os
-import urllib.request
-import urllib.error
+
+import http_client
+import metrics
 
 
 HUBSPOT_API_KEY = os.environ.get("HUBSPOT_API_KEY")
@@ -12,94 +12,126 @@ HUBSPOT_API_KEY = os.environ.get("HUBSPOT_API_KEY")
 BASE_URL = "https://api.hubapi.com"
 SEARCH_URL = f"{BASE_URL}/crm/v3/objects/contacts/search"
 PAGE_SIZE = 100
+# The CRM search API stops paging a query after this many results.
+SEARCH_LIMIT = 10000
 
 
-def get_contacts_for_owner(
-    owner_id: str,
-    updated_after: str | None = None,
-) -> list[dict]:
-    """Fetch all contacts owned by the given HubSpot user id.
+def _format_contact(c: dict) -> dict:
+    properties = c.get("properties", {}) or {}
+    return {
+        "hubspot_id": str(c["id"]),
+        "name": " ".join(
+            filter(None, [
+                (properties.get("firstname") or "").strip(),
+                (properties.get("lastname") or "").strip(),
+            ])
+        ).strip() or "(no name)",
+        "email": properties.get("email", "") or "",
+        "last_modified": properties.get("lastmodifieddate", "") or "",
+    }
+
+
+def _search_pages(filter_groups: list[list[dict]], updated_after: str | None, fetch: str):
+    """Yield pages of formatted contacts matching any of filter_groups, oldest change first.
+
+    Each group is a list of filters that must all match; contacts modified
+    before updated_after are left out. A query is only paged up to
+    SEARCH_LIMIT results, so past that the search restarts from the newest
+    lastmodifieddate seen; contacts sharing that date come back twice.
+    The number of pages is recorded in metrics.fetch_pages under fetch.
+    """
+    pages = 0
+    try:
+        for page in _search(filter_groups, updated_after):
+            pages += 1
+            yield page
+    finally:
+        metrics.fetch_pages.observe(pages, fetch=fetch)
+
+
+def _search(filter_groups: list[list[dict]], updated_after: str | None):
+    api_key = HUBSPOT_API_KEY
+    while True:
+        # 'lastmodifieddate' covers both creation (initial write) and updates.
+        date_filter = []
+        if updated_after is not None:
+            date_filter = [{"propertyName": "lastmodifieddate", "operator": "GTE", "value": updated_after}]
+        after = None
+        received = 0
+        newest = None
+        while True:
+            body = {
+                "filterGroups": [{"filters": group + date_filter} for group in filter_groups],
+                "limit": PAGE_SIZE,
+                # Sort by lastmodifieddate to ensure stable pagination and so
+                # the search can restart from the last date seen.
+                "sorts": [{
+                    "propertyName": "lastmodifieddate",
+                    "direction": "ASCENDING"
+                }]
+            }
+            if after is not None:
+                body["after"] = after
+
+            result = http_client.request_json(
+                "POST",
+                SEARCH_URL,
+                headers={"Authorization": f"Bearer {api_key}"},
+                payload=body,
+                service="HubSpot",
+            )
+
+            page = [_format_contact(c) for c in result.get("results", [])]
+            yield page
+            received += len(page)
+            newest = max([newest or "", *(c["last_modified"] for c in page)]) or None
+
+            next_info = (result.get("paging") or {}).get("next")
+            if not next_info or "after" not in next_info:
+                return
+            after = next_info["after"]
+            if received + PAGE_SIZE > SEARCH_LIMIT:
+                break
+
+        if newest is None or newest == updated_after:
+            raise RuntimeError(
+                f"HubSpot search has more than {SEARCH_LIMIT} contacts modified at {updated_after}"
+            )
+        updated_after = newest
+
+
+def iter_contact_pages(owner_id: str, updated_after: str | None = None):
+    """Yield pages of the contacts owned by the given HubSpot user id, oldest change first.
 
     If updated_after is set (e.g. '2026-01-24T00:00:00.000Z'), only contacts
     modified on or after that date are returned. This includes newly created
     contacts and existing contacts that were updated.
     """
-    all_contacts = []
-    after = None
-    api_key = HUBSPOT_API_KEY
+    owner = [{"propertyName": "hubspot_owner_id", "operator": "EQ", "value": owner_id}]
+    yield from _search_pages([owner], updated_after, "hubspot_contacts")
+
 
-    # 1. Base filter: Owner ID
-    filters = [
-        {
-            "propertyName": "hubspot_owner_id",
-            "operator": "EQ",
-            "value": owner_id,
-        }
+def iter_contacts_not_owned_by(owner_ids: list[str], updated_after: str | None = None):
+    """Yield pages of contacts modified since updated_after whose owner is none of owner_ids.
+
+    A change of owner updates lastmodifieddate, so this finds contacts that
+    were moved away from the owners, or left without one.
+    """
+    groups = [
+        [{"propertyName": "hubspot_owner_id", "operator": "NOT_IN", "values": list(owner_ids)}],
+        [{"propertyName": "hubspot_owner_id", "operator": "NOT_HAS_PROPERTY"}],
     ]
+    yield from _search_pages(groups, updated_after, "hubspot_contacts_not_owned")
 
-    # 2. Date filter: Switch to 'lastmodifieddate'
-    # 'lastmodifieddate' covers both creation (initial write) and updates.
-    if updated_after is not None:
-        filters.append({
-            "propertyName": "lastmodifieddate",
-            "operator": "GTE",
-            "value": updated_after,
-        })
 
-    while True:
-        body = {
-            "filterGroups": [{"filters": filters}],
-            "limit": PAGE_SIZE,
-            # 3. Sort by lastmodifieddate to ensure stable pagination
-            # and to see the most recently 'touched' contacts.
-            "sorts": [{
-                "propertyName": "lastmodifieddate",
-                "direction": "ASCENDING"
-            }]
-        }
-        if after is not None:
-            body["after"] = after
-
-        data = json.dumps(body).encode("utf-8")
-        req = urllib.request.Request(
-            SEARCH_URL,
-            data=data,
-            method="POST",
-            headers={
-                "Content-Type": "application/json",
-                "Authorization": f"Bearer {api_key}",
-            },
-        )
-
-        try:
-            with urllib.request.urlopen(req) as response:
-                result = json.loads(response.read().decode())
-        except urllib.error.HTTPError as e:
-            body = e.read().decode()
-            raise RuntimeError(f"HubSpot API error {e.code}: {body}") from e
-        except urllib.error.URLError as e:
-            raise RuntimeError(f"Request failed: {e.reason}") from e
-
-        results = result.get("results", [])
-        all_contacts.extend(results)
-
-        paging = result.get("paging", {})
-        next_info = paging.get("next")
-        if not next_info or "after" not in next_info:
-            break
-        after = next_info["after"]
-
-    return [
-        {
-            "hubspot_id": str(c["id"]),
-            "name": " ".join(
-                filter(None, [
-                    c.get("properties", {}).get("firstname", "").strip(),
-                    c.get("properties", {}).get("lastname", "").strip(),
-                ])
-            ).strip() or "(no name)",
-            "email": (c.get("properties", {}) or {}).get("email", "") or "",
-            "last_modified": (c.get("properties", {}) or {}).get("lastmodifieddate", ""),
-        }
-        for c in all_contacts
-    ]
\ No newline at end of file
+def get_contacts_for_owner(
+    owner_id: str,
+    updated_after: str | None = None,
+) -> list[dict]:
+    """Fetch all contacts owned by the given HubSpot user id; see iter_contact_pages."""
+    # Keyed by id: a restarted search returns the contacts at its boundary twice.
+    contacts = {}
+    for page in iter_contact_pages(owner_id, updated_after):
+        for contact in page:
+            contacts[contact["hubspot_id"]] = contact
+    return list(contacts.values())
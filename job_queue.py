@@ -0,0 +1,211 @@
+"""
+Durable local job queue for meeting processing, backed by SQLite.
+
+A job is keyed on meeting_id, so enqueueing the same meeting twice (e.g. a
+webhook retry) is a no-op unless the previous attempt failed. Worker threads
+claim queued jobs one at a time and record their process as the job's owner.
+While a process runs jobs it refreshes their heartbeat every JOB_HEARTBEAT
+seconds; a `running` job whose heartbeat is older than JOB_STALE seconds (its
+process died) is claimed again, however long a live worker takes.
+
+Job states: queued -> running -> done | failed
+"""
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+
+
+JOBS_DB = os.environ.get("JOBS_DB", "jobs.db")
+WORKERS = int(os.environ.get("JOB_WORKERS", 2))
+HEARTBEAT = int(os.environ.get("JOB_HEARTBEAT", 30))
+STALE = int(os.environ.get("JOB_STALE", 3 * HEARTBEAT))
+POLL_INTERVAL = 5
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    meeting_id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    enqueued_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    error TEXT,
+    result TEXT,
+    owner TEXT,
+    heartbeat_at REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, enqueued_at);
+"""
+
+_wake = threading.Event()
+_workers: list[threading.Thread] = []
+_workers_lock = threading.Lock()
+
+
+def _connect() -> sqlite3.Connection:
+    conn = sqlite3.connect(JOBS_DB, timeout=30, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.executescript(_SCHEMA)
+    # Queues created before jobs had owners.
+    columns = {row["name"] for row in conn.execute("PRAGMA table_info(jobs)")}
+    for column, kind in (("owner", "TEXT"), ("heartbeat_at", "REAL")):
+        if column not in columns:
+            conn.execute(f"ALTER TABLE jobs ADD COLUMN {column} {kind}")
+    return conn
+
+
+def _owner() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _as_dict(row: sqlite3.Row) -> dict:
+    job = dict(row)
+    job["result"] = json.loads(job["result"]) if job["result"] else None
+    if job["started_at"] is not None:
+        job["wait_seconds"] = round(job["started_at"] - job["enqueued_at"], 3)
+    if job["finished_at"] is not None and job["started_at"] is not None:
+        job["run_seconds"] = round(job["finished_at"] - job["started_at"], 3)
+    return job
+
+
+def get_job(meeting_id: str) -> dict | None:
+    """Return the job for meeting_id with its state and timings, or None."""
+    conn = _connect()
+    try:
+        row = conn.execute("SELECT * FROM jobs WHERE meeting_id = ?", (meeting_id,)).fetchone()
+    finally:
+        conn.close()
+    return _as_dict(row) if row else None
+
+
+def enqueue(meeting_id: str) -> dict:
+    """Queue meeting_id for processing and return its job.
+
+    A meeting that is already queued, running or done is left alone; a failed
+    one is queued again.
+    """
+    conn = _connect()
+    try:
+        conn.execute(
+            """
+            INSERT INTO jobs (meeting_id, status, enqueued_at) VALUES (?, 'queued', ?)
+            ON CONFLICT (meeting_id) DO UPDATE SET
+                status = 'queued',
+                enqueued_at = excluded.enqueued_at,
+                started_at = NULL,
+                finished_at = NULL,
+                error = NULL
+            WHERE jobs.status = 'failed'
+            """,
+            (meeting_id, time.time()),
+        )
+        row = conn.execute("SELECT * FROM jobs WHERE meeting_id = ?", (meeting_id,)).fetchone()
+    finally:
+        conn.close()
+    _wake.set()
+    return _as_dict(row)
+
+
+def _claim() -> str | None:
+    """Mark the oldest claimable job running and return its meeting_id."""
+    conn = _connect()
+    try:
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        row = conn.execute(
+            """
+            SELECT meeting_id FROM jobs
+            WHERE status = 'queued' OR (status = 'running' AND COALESCE(heartbeat_at, started_at) < ?)
+            ORDER BY enqueued_at LIMIT 1
+            """,
+            (now - STALE,),
+        ).fetchone()
+        if row is None:
+            conn.execute("COMMIT")
+            return None
+        conn.execute(
+            """
+            UPDATE jobs SET status = 'running', started_at = ?, heartbeat_at = ?, owner = ?,
+                attempts = attempts + 1
+            WHERE meeting_id = ?
+            """,
+            (now, now, _owner(), row["meeting_id"]),
+        )
+        conn.execute("COMMIT")
+        return row["meeting_id"]
+    finally:
+        conn.close()
+
+
+def _finish(meeting_id: str, status: str, error: str | None = None, result=None) -> None:
+    conn = _connect()
+    try:
+        conn.execute(
+            "UPDATE jobs SET status = ?, finished_at = ?, error = ?, result = ? WHERE meeting_id = ?",
+            (status, time.time(), error, json.dumps(result) if result is not None else None, meeting_id),
+        )
+    finally:
+        conn.close()
+
+
+def _heartbeat() -> None:
+    """Keep the jobs this process is running from being claimed by another."""
+    while True:
+        time.sleep(HEARTBEAT)
+        try:
+            conn = _connect()
+            try:
+                conn.execute(
+                    "UPDATE jobs SET heartbeat_at = ? WHERE status = 'running' AND owner = ?",
+                    (time.time(), _owner()),
+                )
+            finally:
+                conn.close()
+        except sqlite3.Error:
+            pass
+
+
+def run_next(handler) -> bool:
+    """Claim one job and run handler(meeting_id) on it. Returns False if none was queued.
+
+    The handler's return value, if any, is stored as the job result.
+    """
+    meeting_id = _claim()
+    if meeting_id is None:
+        return False
+    try:
+        result = handler(meeting_id)
+    except Exception as e:
+        _finish(meeting_id, "failed", error=str(e))
+    else:
+        _finish(meeting_id, "done", result=result)
+    return True
+
+
+def _work(handler) -> None:
+    while True:
+        try:
+            if run_next(handler):
+                continue
+        except sqlite3.Error:
+            pass
+        _wake.wait(POLL_INTERVAL)
+        _wake.clear()
+
+
+def start_workers(handler, count: int = WORKERS) -> None:
+    """Start count daemon worker threads running handler, once per process."""
+    with _workers_lock:
+        if _workers:
+            return
+        for i in range(count):
+            thread = threading.Thread(target=_work, args=(handler,), name=f"job-worker-{i}", daemon=True)
+            thread.start()
+            _workers.append(thread)
+        heartbeat = threading.Thread(target=_heartbeat, name="job-heartbeat", daemon=True)
+        heartbeat.start()
+        _workers.append(heartbeat)
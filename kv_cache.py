@@ -0,0 +1,234 @@
+"""
+Key-value caches with keyed O(1) reads and writes.
+
+Backends:
+  sqlite  one WAL-mode SQLite file shared by every namespace; safe across
+          threads and processes (default)
+  memory  in-process dict, handy for tests and one-off scripts
+
+Pick the backend with CACHE_BACKEND and the SQLite file with CACHE_DB.
+Values must be JSON-serialisable. With max_entries set, the least recently
+used entries are evicted once a namespace grows past it; with ttl set,
+entries older than ttl seconds are treated as missing and purged on eviction.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+CACHE_BACKEND = os.environ.get("CACHE_BACKEND", "sqlite")
+CACHE_DB = os.environ.get("CACHE_DB", "cache.db")
+
+# Evicting needs a COUNT over the namespace, so only check every so many writes.
+EVICT_EVERY = 64
+
+_MISSING = object()
+
+
+class MemoryCache:
+    """In-process LRU cache."""
+
+    def __init__(self, namespace: str, max_entries: int | None = None, ttl: float | None = None):
+        self.namespace = namespace
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._data: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str, default=None):
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is _MISSING:
+                return default
+            stored_at, value = entry
+            if self.ttl is not None and time.time() - stored_at > self.ttl:
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return json.loads(value)
+
+    def set(self, key: str, value) -> None:
+        encoded = json.dumps(value, ensure_ascii=False)
+        with self._lock:
+            self._data[key] = (time.time(), encoded)
+            self._data.move_to_end(key)
+            if self.max_entries is not None:
+                while len(self._data) > self.max_entries:
+                    self._data.popitem(last=False)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def __contains__(self, key: str) -> bool:
+        return self.get(key, _MISSING) is not _MISSING
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._data)
+
+
+class SqliteCache:
+    """Cache namespace stored in a shared SQLite database."""
+
+    _SCHEMA = """
+    CREATE TABLE IF NOT EXISTS entries (
+        namespace TEXT NOT NULL,
+        key TEXT NOT NULL,
+        value TEXT NOT NULL,
+        stored_at REAL NOT NULL,
+        accessed_at REAL NOT NULL,
+        PRIMARY KEY (namespace, key)
+    );
+    CREATE INDEX IF NOT EXISTS entries_lru ON entries (namespace, accessed_at);
+    """
+
+    def __init__(
+        self,
+        namespace: str,
+        max_entries: int | None = None,
+        ttl: float | None = None,
+        path: str | None = None,
+    ):
+        self.namespace = namespace
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.path = path or CACHE_DB
+        self._local = threading.local()
+        self._writes = 0
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(self._SCHEMA)
+
+    def _conn(self) -> sqlite3.Connection:
+        # sqlite3 connections must not be shared between threads, nor with a
+        # forked child (e.g. gunicorn workers after a preloading master).
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def get(self, key: str, default=None):
+        conn = self._conn()
+        row = conn.execute(
+            "SELECT value, stored_at FROM entries WHERE namespace = ? AND key = ?",
+            (self.namespace, key),
+        ).fetchone()
+        if row is None:
+            return default
+        if self.ttl is not None and time.time() - row[1] > self.ttl:
+            return default
+        if self.max_entries is not None:
+            conn.execute(
+                "UPDATE entries SET accessed_at = ? WHERE namespace = ? AND key = ?",
+                (time.time(), self.namespace, key),
+            )
+        return json.loads(row[0])
+
+    def set(self, key: str, value) -> None:
+        now = time.time()
+        self._conn().execute(
+            """
+            INSERT INTO entries (namespace, key, value, stored_at, accessed_at)
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT (namespace, key) DO UPDATE SET
+                value = excluded.value,
+                stored_at = excluded.stored_at,
+                accessed_at = excluded.accessed_at
+            """,
+            (self.namespace, key, json.dumps(value, ensure_ascii=False), now, now),
+        )
+        self._writes += 1
+        if (self.max_entries is not None or self.ttl is not None) and self._writes % EVICT_EVERY == 0:
+            self.evict()
+
+    def delete(self, key: str) -> None:
+        self._conn().execute(
+            "DELETE FROM entries WHERE namespace = ? AND key = ?",
+            (self.namespace, key),
+        )
+
+    def evict(self) -> None:
+        """Delete expired entries, then the least recently used ones beyond max_entries."""
+        if self.ttl is not None:
+            self._conn().execute(
+                "DELETE FROM entries WHERE namespace = ? AND stored_at < ?",
+                (self.namespace, time.time() - self.ttl),
+            )
+        if self.max_entries is None:
+            return
+        self._conn().execute(
+            """
+            DELETE FROM entries WHERE namespace = ? AND key IN (
+                SELECT key FROM entries WHERE namespace = ?
+                ORDER BY accessed_at DESC LIMIT -1 OFFSET ?
+            )
+            """,
+            (self.namespace, self.namespace, self.max_entries),
+        )
+
+    def __contains__(self, key: str) -> bool:
+        return self.get(key, _MISSING) is not _MISSING
+
+    def __len__(self) -> int:
+        return self._conn().execute(
+            "SELECT COUNT(*) FROM entries WHERE namespace = ?", (self.namespace,)
+        ).fetchone()[0]
+
+
+BACKENDS = {"sqlite": SqliteCache, "memory": MemoryCache}
+
+
+def migrate_json(cache, json_path: str, rename: bool = True) -> int:
+    """Import a legacy JSON cache file into cache.
+
+    With rename=True the file is then moved to *.migrated so the import only
+    happens once. Existing keys in cache win. Returns the number of entries
+    imported.
+    """
+    try:
+        with open(json_path, "r", encoding="utf-8") as f:
+            legacy = json.load(f)
+    except FileNotFoundError:
+        return 0
+    except (json.JSONDecodeError, OSError):
+        # A corrupted legacy cache is not worth keeping.
+        legacy = {}
+    imported = 0
+    for key, value in legacy.items():
+        if key not in cache:
+            cache.set(key, value)
+            imported += 1
+    if rename:
+        try:
+            os.replace(json_path, json_path + ".migrated")
+        except OSError:
+            pass
+    return imported
+
+
+def open_cache(
+    namespace: str,
+    max_entries: int | None = None,
+    ttl: float | None = None,
+    migrate_from: str | None = None,
+    backend: str | None = None,
+):
+    """Open the cache namespace on the configured backend.
+
+    If migrate_from names a legacy JSON cache file, its entries are imported;
+    persistent backends retire the file afterwards.
+    """
+    backend = backend or CACHE_BACKEND
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown cache backend {backend!r}; expected one of {sorted(BACKENDS)}")
+    cache = BACKENDS[backend](namespace, max_entries=max_entries, ttl=ttl)
+    if migrate_from is not None:
+        migrate_json(cache, migrate_from, rename=backend != "memory")
+    return cache
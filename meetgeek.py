@@ -1,57 +1,136 @@
 """
 Fetch meeting transcript from MeetGeek API.
+
+The team's meeting listing is cached in memory (list_meetings). Once loaded,
+a refresh only pages from the newest meetings until it reaches one already
+known, relying on the API listing newest meetings first.
 """
+import hashlib
+import io
 import json
 import os
+import threading
 import time
-import urllib.error
 import urllib.parse
-import urllib.request
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
 
+import http_client
+import metrics
+import tracing
+import transcript_store
+
 
 MEETGEEK_API_KEY = os.environ.get("MEETGEEK_API_KEY")
 BASE_URL = "https://api.meetgeek.ai"
+TEAM_ID = os.environ.get("MEETGEEK_TEAM_ID", "1843")
 PAGE_LIMIT = 500
+# The cached meeting listing is refreshed when older than this many seconds.
+MEETINGS_TTL = int(os.environ.get("MEETGEEK_MEETINGS_TTL", 60))
+
+
+def _stats(start_str: str | None, end_str: str | None) -> dict:
+    if not start_str or not end_str:
+        raise ValueError("Meeting response missing timestamp_start_utc or timestamp_end_utc")
+
+    start = datetime.fromisoformat(start_str.replace("Z", "+00:00"))
+    end = datetime.fromisoformat(end_str.replace("Z", "+00:00"))
+    if start.tzinfo is None:
+        start = start.replace(tzinfo=timezone.utc)
+    if end.tzinfo is None:
+        end = end.replace(tzinfo=timezone.utc)
+    duration = int((end - start).total_seconds())
+    return {"duration": duration, "start_time": start_str}
+
 
 def get_stats(meeting_id: str) -> dict:
     """Get meeting stats (duration and start_time) using MeetGeek API (GET /v1/meetings/{meetingId}).
     Returns a dict with keys: duration (int, seconds), start_time (str, ISO timestamp).
+
+    Answered from the cached meeting listing when it already has both timestamps.
     """
+    cached = _meetings.get(meeting_id)
+    known = bool(cached and cached.get("timestamp_start_utc") and cached.get("timestamp_end_utc"))
+    tracing.set_attributes(cached=known)
+    if known:
+        return _stats(cached["timestamp_start_utc"], cached["timestamp_end_utc"])
+
     api_key = (MEETGEEK_API_KEY or "").strip().strip('"').strip("'")
     if not api_key:
         raise ValueError("MEETGEEK_API_KEY environment variable is not set")
 
     url = f"{BASE_URL}/v1/meetings/{meeting_id}"
-    req = urllib.request.Request(
+    data = http_client.request_json(
+        "GET",
         url,
         headers={
             "Authorization": f"Bearer {api_key}",
             "Accept": "application/json",
             "User-Agent": "curl/8.0",
         },
-        method="GET",
+        service="MeetGeek",
     )
-    try:
-        with urllib.request.urlopen(req) as resp:
-            data = json.loads(resp.read().decode())
-    except urllib.error.HTTPError as e:
-        body = e.read().decode() if e.fp else ""
-        raise RuntimeError(f"MeetGeek API error {e.code}: {body}") from e
-
-    start_str = data.get("timestamp_start_utc")
-    end_str = data.get("timestamp_end_utc")
-    if not start_str or not end_str:
-        raise ValueError("Meeting response missing timestamp_start_utc or timestamp_end_utc")
 
-    start = datetime.fromisoformat(start_str.replace("Z", "+00:00"))
-    end = datetime.fromisoformat(end_str.replace("Z", "+00:00"))
-    if start.tzinfo is None:
-        start = start.replace(tzinfo=timezone.utc)
-    if end.tzinfo is None:
-        end = end.replace(tzinfo=timezone.utc)
-    duration = int((end - start).total_seconds())
-    return {"duration": duration, "start_time": start_str}
+    return _stats(data.get("timestamp_start_utc"), data.get("timestamp_end_utc"))
+
+class TranscriptBuilder:
+    """Builds the human-readable transcript incrementally, one page of sentences at a time.
+
+    Same-speaker runs are merged across page boundaries, finished lines are
+    written straight into one buffer, and attendees are tracked with a set
+    while keeping first-appearance order.
+    """
+
+    def __init__(self):
+        self._out = io.StringIO()
+        self._has_lines = False
+        self._speaker: str | None = None
+        self._chunks: list[str] = []
+        self._seen: set[str] = set()
+        self._attendees: list[str] = []  # unique speakers in order of first appearance
+
+    def _flush(self) -> None:
+        if self._speaker is None:
+            return
+        if self._has_lines:
+            self._out.write("\n")
+        self._out.write(f"{self._speaker}: {' '.join(self._chunks)}")
+        self._has_lines = True
+
+    def feed(self, sentences: list[dict]) -> None:
+        for item in sentences:
+            speaker = item.get("speaker") or "Unknown speaker"
+            text = item.get("transcript", "")
+
+            # Skip completely empty texts
+            if not text:
+                continue
+
+            if speaker not in self._seen:
+                self._seen.add(speaker)
+                self._attendees.append(speaker)
+
+            # If this is the same speaker as the previous one, just accumulate text
+            if speaker == self._speaker:
+                self._chunks.append(text)
+            else:
+                # Flush previous speaker, if any, and start tracking the new one
+                self._flush()
+                self._speaker = speaker
+                self._chunks = [text]
+
+    def result(self) -> dict:
+        # Flush the last speaker group
+        self._flush()
+        self._speaker = None
+        self._chunks = []
+        # remove "Unknown speaker" and unnamed "Speaker_N" labels from attendees
+        attendees = [
+            attendee for attendee in self._attendees
+            if attendee != "Unknown speaker" and not attendee.startswith("Speaker_")
+        ]
+        return {"transcript": self._out.getvalue(), "attendees": attendees}
+
 
 def process_transcript(sentences: list[dict]) -> dict:
     """
@@ -72,100 +151,144 @@ def process_transcript(sentences: list[dict]) -> dict:
         "attendees": ["Speaker A", "Speaker B"]
       }
     """
-    if not sentences:
-        return {"transcript": "", "attendees": []}
-
-    lines = []
-    current_speaker = None
-    current_chunks = []
-    attendees_seen: list[str] = []  # unique speakers in order of first appearance
-
-    for item in sentences:
-        speaker = item.get("speaker") or "Unknown speaker"
-        text = item.get("transcript", "")
-
-        # Skip completely empty texts
-        if not text:
-            continue
-
-        if speaker not in attendees_seen:
-            attendees_seen.append(speaker)
-
-        # If this is the same speaker as the previous one, just accumulate text
-        if speaker == current_speaker:
-            current_chunks.append(text)
-        else:
-            # Flush previous speaker, if any
-            if current_speaker is not None:
-                joined = " ".join(current_chunks)
-                lines.append(f"{current_speaker}: {joined}")
-
-            # Start tracking new speaker
-            current_speaker = speaker
-            current_chunks = [text]
-
-    # Flush the last speaker group
-    if current_speaker is not None and current_chunks:
-        joined = " ".join(current_chunks)
-        lines.append(f"{current_speaker}: {joined}")
-
-    # remove "Unknown speaker" from attendees
-    attendees_seen = [attendee for attendee in attendees_seen if attendee != "Unknown speaker"]
-    attendees_seen = [attendee for attendee in attendees_seen if not attendee.startswith("Speaker_")]
-    human_readable = "\n".join(lines)
-    return {"transcript": human_readable, "attendees": attendees_seen}
-
-
-def get_transcript(meeting_id: str) -> dict:
+    builder = TranscriptBuilder()
+    builder.feed(sentences)
+    return builder.result()
+
+
+def _fetch_transcript_page(meeting_id: str, api_key: str, cursor: str | None) -> dict:
+    """Fetch one page of transcript sentences, retrying network failures."""
+    url = f"{BASE_URL}/v1/meetings/{meeting_id}/transcript?limit={PAGE_LIMIT}"
+    if cursor:
+        url += f"&cursor={urllib.parse.quote(cursor)}"
+
+    headers = {
+        "Authorization": f"Bearer {api_key}",
+        "User-Agent": "curl/7.68.0",
+    }
+    for attempt in range(3):
+        try:
+            with tracing.span("transcript_page", first=cursor is None, attempt=attempt + 1):
+                return http_client.request_json("GET", url, headers=headers, service="MeetGeek")
+        except http_client.HttpError as e:
+            # Only retry when no response came back (network error or timeout).
+            if e.status is not None:
+                raise
+            if attempt < 2:
+                time.sleep(5)
+            else:
+                raise RuntimeError(f"MeetGeek API request failed after 3 attempts: {e}") from e
+
+
+def get_transcript(meeting_id: str, refresh: bool = False) -> dict:
     """Fetch the full transcript for a meeting by ID.
 
     Uses Bearer token from MEETGEEK_API_KEY. Handles pagination and returns
     a dict with:
       transcript: human-readable transcript (speaker-labeled, same-speaker lines merged)
       attendees: list of speaker names in order of first appearance
+
+    Reads through transcript_store, so the API is only paged the first time a
+    meeting is requested. Pass refresh=True to re-fetch from MeetGeek.
+
+    Pages are consumed as they arrive: while one page is merged into the
+    transcript and appended to the store, the next one is already being fetched.
     """
+    with tracing.span("get_transcript", meeting_id=meeting_id) as span:
+        if not refresh:
+            stored = transcript_store.get(meeting_id)
+            span.set(store_hit=stored is not None)
+            if stored is not None:
+                span.set(chars=len(stored["transcript"]))
+                return stored
+        result = _fetch_transcript(meeting_id)
+        span.set(chars=len(result["transcript"]))
+        return result
+
+
+def _fetch_transcript(meeting_id: str) -> dict:
+    """Page the transcript from MeetGeek into transcript_store and return it."""
     api_key = (MEETGEEK_API_KEY or "").strip().strip('"').strip("'")
     if not api_key:
         raise ValueError("MEETGEEK_API_KEY environment variable is not set")
 
-    all_sentences: list[dict] = []
+    builder = TranscriptBuilder()
+    writer = transcript_store.EntryWriter(meeting_id)
+    pages = 0
+    with ThreadPoolExecutor(max_workers=1) as prefetch:
+        try:
+            data = _fetch_transcript_page(meeting_id, api_key, None)
+            while True:
+                pages += 1
+                cursor = (data.get("pagination") or {}).get("next_cursor")
+                next_page = tracing.submit(prefetch, _fetch_transcript_page, meeting_id, api_key, cursor) if cursor else None
+                sentences = data.get("sentences", [])
+                builder.feed(sentences)
+                writer.add_page(sentences)
+                if next_page is None:
+                    break
+                data = next_page.result()
+        except BaseException:
+            writer.abort()
+            raise
+        finally:
+            metrics.fetch_pages.observe(pages, fetch="meetgeek_transcript")
+            tracing.set_attributes(pages=pages)
+
+    result = builder.result()
+    if result["transcript"]:
+        writer.commit(result)
+    else:
+        # Nothing transcribed yet (e.g. analysis still running): fetch again next time.
+        writer.abort()
+    return result
+
+def _meeting_token(token: str | None = None) -> str:
+    api_token = (token or os.environ.get("MEETGEEK_API_KEY") or "").strip()
+    if not api_token:
+        raise ValueError("Provide token or set MEETGEEK_API_TOKEN")
+    return api_token
+
+
+def _meeting_id(meeting: dict) -> str | None:
+    return meeting.get("meeting_id") or meeting.get("id")
+
+
+def iter_meeting_pages(token: str | None = None):
+    """Yield pages of the team's meetings, as returned by the API (newest first)."""
+    api_token = _meeting_token(token)
+    # EU base URL (use api.meetgeek.ai or api-us.meetgeek.ai if needed)
+    base_url = f"{BASE_URL}/v1/teams/{TEAM_ID}/meetings"
+    headers = {
+        "Authorization": f"Bearer {api_token}",
+        "Accept": "application/json",
+        "User-Agent": "curl/8.0",  # API often blocks Python's default User-Agent
+    }
+
     cursor: str | None = None
+    pages = 0
+    try:
+        while True:
+            params = {"limit": PAGE_LIMIT}
+            if cursor:
+                params["cursor"] = cursor
+            url = f"{base_url}?{urllib.parse.urlencode(params)}"
 
-    while True:
-        url = f"{BASE_URL}/v1/meetings/{meeting_id}/transcript?limit={PAGE_LIMIT}"
-        if cursor:
-            url += f"&cursor={urllib.parse.quote(cursor)}"
-
-        req = urllib.request.Request(
-            url,
-            headers={
-                "Authorization": f"Bearer {api_key}",
-                "User-Agent": "curl/7.68.0",
-            },
-            method="GET",
-        )
-        for attempt in range(3):
-            try:
-                with urllib.request.urlopen(req) as resp:
-                    data = json.loads(resp.read().decode())
-                break
-            except urllib.error.HTTPError as e:
-                body = e.read().decode() if e.fp else ""
-                raise RuntimeError(f"MeetGeek API error {e.code}: {body}") from e
-            except (urllib.error.URLError, TimeoutError) as e:
-                if attempt < 2:
-                    time.sleep(5)
-                else:
-                    raise RuntimeError(f"MeetGeek API request failed after 3 attempts: {e}") from e
+            data = http_client.request_json("GET", url, headers=headers, service="MeetGeek")
+            pages += 1
 
-        all_sentences.extend(data.get("sentences", []))
+            meetings = data.get("meetings") or []
+            yield meetings
 
-        pagination = data.get("pagination", {})
-        cursor = pagination.get("next_cursor")
-        if not cursor:
-            break
+            pagination = data.get("pagination") or {}
+            next_cursor = pagination.get("next_cursor")
+            if not next_cursor or not meetings:
+                break
+            cursor = next_cursor
+    finally:
+        # Also runs when the caller stops early, e.g. an incremental refresh.
+        metrics.fetch_pages.observe(pages, fetch="meetgeek_meetings")
 
-    return process_transcript(all_sentences)
 
 def get_all_meetings(token: str | None = None) -> list[dict]:
     """
@@ -174,45 +297,72 @@ def get_all_meetings(token: str | None = None) -> list[dict]:
 
     Pass the Bearer token as `token`, or set MEETGEEK_API_TOKEN env var.
     """
-    api_token = (token or os.environ.get("MEETGEEK_API_KEY") or "").strip()
-    if not api_token:
-        raise ValueError("Provide token or set MEETGEEK_API_TOKEN")
+    return [m for page in iter_meeting_pages(token) for m in page]
+
+
+class _MeetingCache:
+    """The team's meeting listing, kept in memory and refreshed from the newest pages."""
+
+    def __init__(self):
+        self.meetings: list[dict] = []
+        self.by_id: dict[str, dict] = {}
+        self.etag: str | None = None
+        self.refreshed_at: float | None = None
+        self._lock = threading.Lock()
+
+    def get(self, meeting_id: str) -> dict | None:
+        return self.by_id.get(meeting_id)
+
+    def _refresh(self) -> None:
+        """Fetch pages until one contains an already known meeting.
+
+        Meetings on the fetched pages replace their cached copies (e.g. an end
+        time that was missing while the meeting was running); new ones go first.
+        """
+        added: list[dict] = []
+        updated: dict[str, dict] = {}
+        for page in iter_meeting_pages():
+            reached_known = False
+            for meeting in page:
+                meeting_id = _meeting_id(meeting)
+                if meeting_id in self.by_id:
+                    updated[meeting_id] = meeting
+                    reached_known = True
+                else:
+                    added.append(meeting)
+            if reached_known:
+                break
 
-    # EU base URL (use api.meetgeek.ai or api-us.meetgeek.ai if needed)
-    base_url = "https://api.meetgeek.ai/v1/teams/1843/meetings"
-    headers = {
-        "Authorization": f"Bearer {api_token}",
-        "Accept": "application/json",
-        "User-Agent": "curl/8.0",  # API often blocks Python's default User-Agent
-    }
+        if self.etag is None or added or any(self.by_id[i] != m for i, m in updated.items()):
+            meetings = added + [updated.get(_meeting_id(m), m) for m in self.meetings]
+            body = json.dumps(meetings, sort_keys=True).encode("utf-8")
+            # New list objects, so readers holding the old ones are unaffected.
+            self.meetings = meetings
+            self.by_id = {_meeting_id(m): m for m in meetings}
+            self.etag = hashlib.sha1(body).hexdigest()
+        self.refreshed_at = time.monotonic()
 
-    all_meetings: list[dict] = []
-    cursor: str | None = None
-    limit = 500  # max per request
+    def current(self) -> tuple[list[dict], str]:
+        """Return (meetings, etag), refreshing first if older than MEETINGS_TTL.
 
-    while True:
-        params = {"limit": limit}
-        if cursor:
-            params["cursor"] = cursor
-        url = f"{base_url}?{urllib.parse.urlencode(params)}"
+        A failed refresh keeps serving the cached listing, if there is one.
+        """
+        with self._lock:
+            if self.refreshed_at is None or time.monotonic() - self.refreshed_at >= MEETINGS_TTL:
+                try:
+                    self._refresh()
+                except Exception:
+                    if self.refreshed_at is None:
+                        raise
+            return self.meetings, self.etag
 
-        req = urllib.request.Request(url, headers=headers, method="GET")
-        try:
-            with urllib.request.urlopen(req) as resp:
-                data = json.loads(resp.read().decode())
-        except urllib.error.HTTPError as e:
-            body = e.read().decode()
-            raise RuntimeError(f"MeetGeek API error {e.code}: {body}") from e
-        except urllib.error.URLError as e:
-            raise RuntimeError(f"Request failed: {e.reason}") from e
-
-        meetings = data.get("meetings") or []
-        all_meetings.extend(meetings)
-
-        pagination = data.get("pagination") or {}
-        next_cursor = pagination.get("next_cursor")
-        if not next_cursor or not meetings:
-            break
-        cursor = next_cursor
-
-    return all_meetings
\ No newline at end of file
+
+_meetings = _MeetingCache()
+
+
+def list_meetings() -> tuple[list[dict], str]:
+    """Return the cached team meeting listing (newest first) and an ETag for it.
+
+    The listing is shared; callers must not modify it.
+    """
+    return _meetings.current()
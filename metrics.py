@@ -0,0 +1,239 @@
+"""
+In-process counters and histograms, rendered in the Prometheus text format
+for the /metrics endpoint.
+
+http_client records every upstream request (latency, status, bytes) labelled
+by upstream, the paged fetches record how many pages they took, and the app
+times its routes.
+
+Values are kept per process. Under gunicorn, where any worker may answer a
+scrape, share() makes every process write a snapshot of its values to
+<directory>/<pid>.json every SNAPSHOT_INTERVAL seconds, and render() sums
+the snapshots of all processes, including workers that have exited, so
+counters never go backwards between scrapes.
+"""
+import bisect
+import glob
+import json
+import os
+import threading
+import time
+
+
+# Seconds; upstream calls range from a cached Supabase lookup to a long Groq completion.
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+PAGE_BUCKETS = (1, 2, 3, 5, 10, 20, 50, 100, 200)
+SNAPSHOT_INTERVAL = float(os.environ.get("METRICS_SNAPSHOT_INTERVAL", 1.0))
+
+_registry: list = []
+_shared_dir: str | None = None
+_snapshot_pid: int | None = None
+
+
+def _format_labels(names: tuple, values: tuple, extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+class Counter:
+    """A monotonically increasing value per label combination."""
+
+    type = "counter"
+
+    def __init__(self, name: str, help: str, labels: tuple = ()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values: dict[tuple, float] = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = tuple(labels[name] for name in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(tuple(labels[name] for name in self.labels), 0)
+
+    def totals(self, label: str) -> dict[str, float]:
+        """Sum the values per value of one label, e.g. requests per upstream."""
+        position = self.labels.index(label)
+        totals: dict[str, float] = {}
+        with self._lock:
+            for key, value in self._values.items():
+                totals[key[position]] = totals.get(key[position], 0) + value
+        return totals
+
+    def dump(self) -> dict:
+        with self._lock:
+            return {json.dumps(key): value for key, value in self._values.items()}
+
+    def merge(self, merged: dict, dumped: dict) -> None:
+        for key, value in dumped.items():
+            key = tuple(json.loads(key))
+            merged[key] = merged.get(key, 0) + value
+
+    def samples(self, values: dict | None = None):
+        if values is None:
+            with self._lock:
+                values = dict(self._values)
+        for key, value in sorted(values.items()):
+            yield f"{self.name}{_format_labels(self.labels, key)} {_format_value(value)}"
+
+
+class Histogram:
+    """Observations counted into cumulative buckets, with their sum and count."""
+
+    type = "histogram"
+
+    def __init__(self, name: str, help: str, labels: tuple = (), buckets: tuple = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        # label values -> [per-bucket counts (last is +Inf), sum]
+        self._values: dict[tuple, list] = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def observe(self, value: float, **labels) -> None:
+        key = tuple(labels[name] for name in self.labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            entry[0][index] += 1
+            entry[1] += value
+
+    def dump(self) -> dict:
+        with self._lock:
+            return {json.dumps(key): [list(counts), total] for key, (counts, total) in self._values.items()}
+
+    def merge(self, merged: dict, dumped: dict) -> None:
+        for key, (counts, total) in dumped.items():
+            if len(counts) != len(self.buckets) + 1:
+                continue
+            entry = merged.setdefault(tuple(json.loads(key)), [[0] * len(counts), 0.0])
+            entry[0] = [a + b for a, b in zip(entry[0], counts)]
+            entry[1] += total
+
+    def samples(self, values: dict | None = None):
+        if values is None:
+            with self._lock:
+                values = {key: (list(counts), total) for key, (counts, total) in self._values.items()}
+        for key, (counts, total) in sorted(values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                yield f"{self.name}_bucket{_format_labels(self.labels, key, le)} {cumulative}"
+            yield f"{self.name}_sum{_format_labels(self.labels, key)} {_format_value(total)}"
+            yield f"{self.name}_count{_format_labels(self.labels, key)} {cumulative}"
+
+
+def _write_snapshot() -> None:
+    path = os.path.join(_shared_dir, f"{os.getpid()}.json")
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({metric.name: metric.dump() for metric in _registry}, f)
+    os.replace(tmp, path)
+
+
+def _snapshot_loop(directory: str) -> None:
+    while _shared_dir == directory and _snapshot_pid == os.getpid():
+        time.sleep(SNAPSHOT_INTERVAL)
+        try:
+            _write_snapshot()
+        except Exception:
+            # Never let a full disk kill the snapshots; the next one may succeed.
+            pass
+
+
+def share(directory: str) -> None:
+    """Aggregate metrics across processes through snapshot files in directory.
+
+    Call it in the process that forks the workers, then after_fork() in each
+    worker.
+    """
+    global _shared_dir, _snapshot_pid
+    os.makedirs(directory, exist_ok=True)
+    _shared_dir = directory
+    _snapshot_pid = os.getpid()
+    _write_snapshot()
+    threading.Thread(target=_snapshot_loop, args=(directory,), name="metrics-snapshot", daemon=True).start()
+
+
+def after_fork() -> None:
+    """Start a forked worker from zero, as its parent's values are in the parent's snapshot."""
+    for metric in _registry:
+        # New locks too: the parent's snapshot thread may have held one while forking.
+        metric._lock = threading.Lock()
+        metric._values = {}
+    if _shared_dir is not None:
+        share(_shared_dir)
+
+
+def _merged_values() -> dict[str, dict]:
+    _write_snapshot()
+    merged: dict[str, dict] = {metric.name: {} for metric in _registry}
+    metrics = {metric.name: metric for metric in _registry}
+    for path in glob.glob(os.path.join(glob.escape(_shared_dir), "*.json")):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                snapshot = json.load(f)
+        except (OSError, ValueError):
+            continue
+        for name, dumped in snapshot.items():
+            if name in metrics:
+                metrics[name].merge(merged[name], dumped)
+    return merged
+
+
+def render() -> str:
+    """Return every registered metric in the Prometheus text exposition format.
+
+    With share() the values are summed over all processes' snapshots.
+    """
+    merged = _merged_values() if _shared_dir is not None else {}
+    lines = []
+    for metric in _registry:
+        lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.type}")
+        lines.extend(metric.samples(merged.get(metric.name)))
+    return "\n".join(lines) + "\n"
+
+
+def upstream_label(service: str) -> str:
+    """Map an http_client service name ("Supabase RPC", "MeetGeek") to an upstream label."""
+    return service.split()[0].lower() if service else "unknown"
+
+
+upstream_requests = Counter(
+    "upstream_requests_total", "Requests to upstream APIs by status code.", ("upstream", "method", "status")
+)
+upstream_seconds = Histogram(
+    "upstream_request_seconds", "Upstream request latency, until the body was read.", ("upstream",)
+)
+upstream_sent_bytes = Counter("upstream_sent_bytes_total", "Request body bytes sent upstream.", ("upstream",))
+upstream_received_bytes = Counter(
+    "upstream_received_bytes_total", "Response body bytes received from upstream, before decompression.", ("upstream",)
+)
+fetch_pages = Histogram("fetch_pages", "Pages requested per paged fetch.", ("fetch",), buckets=PAGE_BUCKETS)
+http_request_seconds = Histogram(
+    "http_request_seconds", "Flask route latency, until the response was returned.", ("route", "method", "status")
+)
+groq_cache_requests = Counter("groq_cache_requests_total", "Groq response cache lookups.", ("result",))
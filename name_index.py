@@ -0,0 +1,202 @@
+"""
+Inverted index over a contact list for fast name matching.
+
+Two names are similar if some word (longer than 2 characters,
+case-insensitive) of one is contained in some word of the other. Similar
+contacts can then be ranked by character-trigram (Dice) similarity to keep
+only the best few per name.
+
+resolve() maps a name straight to a contact when the match is unambiguous,
+with a confidence score, so the LLM is only needed for the rest.
+"""
+import heapq
+import threading
+import unicodedata
+
+
+MIN_WORD = 3
+
+# Confidence of each deterministic match kind.
+EXACT = 1.0
+NORMALIZED = 0.95
+UNIQUE_TOKENS = 0.9
+UNIQUE_SINGLE_TOKEN = 0.7
+
+
+def _words(name: str) -> list[str]:
+    return [w for w in name.strip().lower().split() if len(w) >= MIN_WORD]
+
+
+def normalize(name: str) -> str:
+    """Lowercase, strip accents and punctuation, and collapse whitespace."""
+    decomposed = unicodedata.normalize("NFKD", name)
+    kept = [
+        ch if ch.isalnum() else " "
+        for ch in decomposed
+        if not unicodedata.combining(ch)
+    ]
+    return " ".join("".join(kept).lower().split())
+
+
+def _trigrams(name: str) -> set[str]:
+    padded = " " + " ".join(name.lower().split()) + " "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _substrings(word: str, max_len: int):
+    """Yield every substring of word with MIN_WORD <= length <= max_len."""
+    for size in range(MIN_WORD, min(len(word), max_len) + 1):
+        for start in range(len(word) - size + 1):
+            yield word[start:start + size]
+
+
+class NameIndex:
+    """Token and substring postings for a fixed list of contacts."""
+
+    def __init__(self, contacts: list[dict]):
+        self.contacts = contacts
+        # word -> positions of contacts having exactly that word
+        self._words: dict[str, set[int]] = {}
+        # substring of a word -> positions of contacts with a word containing it
+        self._containing: dict[str, set[int]] = {}
+        # trigram -> positions of contacts whose name has it, plus trigram counts
+        self._grams: dict[str, list[int]] = {}
+        self._gram_counts: list[int] = []
+        # exact / normalized full name -> positions, normalized token -> positions
+        self._exact: dict[str, set[int]] = {}
+        self._normalized: dict[str, set[int]] = {}
+        self._tokens: dict[str, set[int]] = {}
+        for pos, contact in enumerate(contacts):
+            name = contact.get("name", "")
+            self._exact.setdefault(name, set()).add(pos)
+            normalized = normalize(name)
+            self._normalized.setdefault(normalized, set()).add(pos)
+            for token in normalized.split():
+                self._tokens.setdefault(token, set()).add(pos)
+            for word in _words(name):
+                self._words.setdefault(word, set()).add(pos)
+                for sub in _substrings(word, len(word)):
+                    self._containing.setdefault(sub, set()).add(pos)
+            grams = _trigrams(name)
+            for gram in grams:
+                self._grams.setdefault(gram, []).append(pos)
+            self._gram_counts.append(len(grams))
+
+    def matches(self, name: str) -> set[int]:
+        """Return positions of contacts similar to name."""
+        found: set[int] = set()
+        for word in _words(name):
+            # Contact words that contain this word (including equal ones).
+            found |= self._containing.get(word, set())
+            # Contact words that are strictly shorter and contained in this word.
+            for sub in _substrings(word, len(word) - 1):
+                found |= self._words.get(sub, set())
+        return found
+
+    def rank(self, name: str, candidates: set[int], k: int) -> list[int]:
+        """Return up to k positions from candidates, most trigram-similar to name first.
+
+        Scores every candidate at once by walking the trigram postings of name,
+        so the cost is proportional to the shared trigrams, not to pairs.
+        """
+        grams = _trigrams(name)
+        shared: dict[int, int] = {}
+        for gram in grams:
+            for pos in self._grams.get(gram, ()):
+                if pos in candidates:
+                    shared[pos] = shared.get(pos, 0) + 1
+        scores = {
+            pos: 2 * count / (len(grams) + self._gram_counts[pos])
+            for pos, count in shared.items()
+        }
+        return heapq.nlargest(k, scores, key=lambda pos: (scores[pos], -pos))
+
+    def top_k(self, names: list[str], k: int) -> tuple[list[dict], int]:
+        """Return the compact top-k similar contacts per name and the number of similar contacts.
+
+        The result holds only name and hubspot_id, deduplicated across names.
+        """
+        seen: set[int] = set()
+        similar: set[int] = set()
+        ranked: list[dict] = []
+        for name in names:
+            candidates = self.matches(name)
+            similar |= candidates
+            for pos in self.rank(name, candidates, k):
+                if pos not in seen:
+                    seen.add(pos)
+                    contact = self.contacts[pos]
+                    ranked.append({"name": contact["name"], "hubspot_id": contact["hubspot_id"]})
+        return ranked, len(similar)
+
+    def _unique(self, positions: set[int]) -> int | None:
+        """Return a position if all of positions share one hubspot_id, else None."""
+        ids = {self.contacts[pos]["hubspot_id"] for pos in positions}
+        return min(positions) if len(ids) == 1 else None
+
+    def resolve(self, name: str) -> tuple[int | None, float]:
+        """Return (position, confidence) of the contact name unambiguously refers to.
+
+        Tries an exact name match, then a normalized one, then the contacts
+        whose names contain every normalized token of name. Returns (None, 0.0)
+        if nothing or more than one contact matches.
+        """
+        if name in self._exact:
+            pos = self._unique(self._exact[name])
+            return (pos, EXACT) if pos is not None else (None, 0.0)
+        normalized = normalize(name)
+        if normalized in self._normalized:
+            pos = self._unique(self._normalized[normalized])
+            return (pos, NORMALIZED) if pos is not None else (None, 0.0)
+        tokens = normalized.split()
+        if not tokens:
+            return None, 0.0
+        found = set(self._tokens.get(tokens[0], set()))
+        for token in tokens[1:]:
+            found &= self._tokens.get(token, set())
+        if not found:
+            return None, 0.0
+        pos = self._unique(found)
+        if pos is None:
+            return None, 0.0
+        return pos, UNIQUE_TOKENS if len(tokens) > 1 else UNIQUE_SINGLE_TOKEN
+
+    def resolve_all(self, names: list[str], threshold: float) -> tuple[list[dict], list[str]]:
+        """Split names into resolved {name, hubspot_id} entries and the names left over.
+
+        A name counts as resolved when resolve() is at least threshold confident.
+        Resolved entries use the contact's full name and are unique per hubspot_id.
+        """
+        resolved: list[dict] = []
+        unresolved: list[str] = []
+        seen: set[str] = set()
+        for name in names:
+            pos, confidence = self.resolve(name)
+            if pos is None or confidence < threshold:
+                unresolved.append(name)
+                continue
+            contact = self.contacts[pos]
+            if contact["hubspot_id"] not in seen:
+                seen.add(contact["hubspot_id"])
+                resolved.append({"name": contact["name"], "hubspot_id": contact["hubspot_id"]})
+        return resolved, unresolved
+
+
+_last: tuple[list[dict], NameIndex] | None = None
+_lock = threading.Lock()
+
+
+def index_for(contacts: list[dict]) -> NameIndex:
+    """Return the index for contacts, rebuilding only when a different list is passed.
+
+    contact_loader hands out the same list object until its snapshot changes,
+    so the index is built once per snapshot.
+    """
+    global _last
+    with _lock:
+        if _last is not None and _last[0] is contacts:
+            return _last[1]
+    index = NameIndex(contacts)
+    with _lock:
+        _last = (contacts, index)
+    return index
@@ -0,0 +1,175 @@
+"""
+Buffered JSON-lines logging for the web app.
+
+log() only stamps the record and puts it on a queue; a daemon thread writes
+whatever has queued up since its last write in one batch and rotates the file once it grows past
+LOG_MAX_BYTES, keeping LOG_BACKUPS old files (log.txt.1, log.txt.2, ...).
+Inside a request (see start_request) each record carries the request id and
+the seconds elapsed since the request started:
+
+  {"ts": "2026-03-01T12:00:00.123456", "msg": "job", "status": "queued", "request_id": "3f2a...", "elapsed": 0.004}
+
+Forked server workers call use_worker_files() so each writes and rotates its
+own files (log.<pid>.txt) rather than racing on one; JsonLinesWriter.files()
+lists every process's files.
+"""
+import atexit
+import contextvars
+import glob
+import json
+import os
+import queue
+import re
+import threading
+import time
+import uuid
+from datetime import datetime
+
+
+LOG_FILE = os.environ.get("LOG_FILE", "log.txt")
+LOG_MAX_BYTES = int(os.environ.get("LOG_MAX_BYTES", 10 * 1024 * 1024))
+LOG_BACKUPS = int(os.environ.get("LOG_BACKUPS", 5))
+# Records waiting to be written; further records are dropped (and counted) when full.
+QUEUE_SIZE = 10000
+BATCH_SIZE = 500
+
+_request = contextvars.ContextVar("request_log_request", default=None)
+_worker_files = False
+
+
+def use_worker_files() -> None:
+    """Write to per-process files from now on; for forked server workers."""
+    global _worker_files
+    _worker_files = True
+
+
+def _worker_path(path: str, pid: int) -> str:
+    root, ext = os.path.splitext(path)
+    return f"{root}.{pid}{ext}"
+
+
+def start_request(request_id: str | None = None) -> str:
+    """Tag log records from this context with request_id (a new one if None) and return it."""
+    request_id = request_id or uuid.uuid4().hex
+    _request.set((request_id, time.perf_counter()))
+    return request_id
+
+
+def end_request() -> None:
+    _request.set(None)
+
+
+def current_request_id() -> str | None:
+    current = _request.get()
+    return current[0] if current else None
+
+
+class JsonLinesWriter:
+    """Appends dicts to a JSON-lines file from a background thread, with size-based rotation."""
+
+    def __init__(self, path: str, max_bytes: int = LOG_MAX_BYTES, backups: int = LOG_BACKUPS):
+        self.base_path = path
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.dropped = 0
+        self._lock = threading.Lock()
+        self._pid = None
+        self._queue: queue.Queue | None = None
+
+    def _ensure_thread(self) -> queue.Queue:
+        # Started lazily, and again in a forked child, which inherits no threads.
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self.path = _worker_path(self.base_path, os.getpid()) if _worker_files else self.base_path
+                    self._queue = queue.Queue(QUEUE_SIZE)
+                    threading.Thread(
+                        target=self._run, args=(self._queue,), name=f"log-writer-{self.path}", daemon=True
+                    ).start()
+                    self._pid = os.getpid()
+        return self._queue
+
+    def put(self, record: dict) -> None:
+        try:
+            self._ensure_thread().put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def flush(self, timeout: float = 5.0) -> None:
+        """Wait up to timeout seconds for queued records to be written."""
+        q = self._queue
+        if q is None or self._pid != os.getpid():
+            return
+        deadline = time.monotonic() + timeout
+        while q.unfinished_tasks and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+    def files(self) -> list[str]:
+        """Every file of this log, including other workers' files, each after its backups."""
+        root, ext = os.path.splitext(self.base_path)
+        worker = re.compile(re.escape(root) + r"\.\d+" + re.escape(ext))
+        bases = {self.base_path}
+        for path in glob.glob(f"{glob.escape(root)}.*{glob.escape(ext)}*"):
+            match = worker.match(path)
+            if match:
+                bases.add(match.group(0))
+        return [
+            f"{path}.{i}" if i else path
+            for path in sorted(bases)
+            for i in range(self.backups, -1, -1)
+            if os.path.exists(f"{path}.{i}" if i else path)
+        ]
+
+    def _rotate(self) -> None:
+        for i in range(self.backups - 1, 0, -1):
+            if os.path.exists(f"{self.path}.{i}"):
+                os.replace(f"{self.path}.{i}", f"{self.path}.{i + 1}")
+        if self.backups > 0:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+
+    def _write(self, batch: list[dict]) -> None:
+        lines = [json.dumps(record, ensure_ascii=False, default=str) + "\n" for record in batch]
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.writelines(lines)
+            size = f.tell()
+        if size >= self.max_bytes:
+            self._rotate()
+
+    def _run(self, q: queue.Queue) -> None:
+        while True:
+            batch = [q.get()]
+            while len(batch) < BATCH_SIZE:
+                try:
+                    batch.append(q.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self._write(batch)
+            except Exception:
+                # Never let a logging failure (e.g. a full disk) kill the writer.
+                pass
+            finally:
+                for _ in batch:
+                    q.task_done()
+
+
+_writer = JsonLinesWriter(LOG_FILE)
+atexit.register(_writer.flush)
+
+
+def log(message: str, **fields) -> None:
+    """Queue a log record; extra fields are added to it as JSON values."""
+    record = {"ts": datetime.now().isoformat(), "msg": message, **fields}
+    current = _request.get()
+    if current is not None:
+        record["request_id"] = current[0]
+        record["elapsed"] = round(time.perf_counter() - current[1], 6)
+    _writer.put(record)
+
+
+def flush(timeout: float = 5.0) -> None:
+    """Wait for queued log records to reach the file."""
+    _writer.flush(timeout)
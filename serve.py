@@ -0,0 +1,142 @@
+"""
+Production entry point: run the API under gunicorn with several worker
+processes, each serving requests on a thread pool.
+
+  python serve.py --workers 4 --threads 8 --bind 0.0.0.0:5000
+
+The app is loaded and warmed up once in the master process (contacts, name
+index, note index, meeting listing, caches) and then forked, so workers start
+with everything in memory. After the fork each worker drops the HTTP
+connections it inherited, switches to its own log and trace files, starts
+its metrics from zero and starts its job queue workers. /metrics sums the
+snapshots every process writes to METRICS_DIR.
+
+gunicorn is optional; without it the app runs on Werkzeug's threaded server
+in a single process. `python hello.py` still starts the debug server.
+"""
+import argparse
+import glob
+import os
+import tempfile
+import time
+
+import http_client
+import job_queue
+import meetgeek
+import metrics
+import name_index
+import request_log
+import supa
+from contact_loader import load_full, load_short
+from hello import create_app, encode_contacts, process_meeting
+
+try:
+    import gunicorn.app.base
+except ImportError:
+    gunicorn = None
+
+
+BIND = os.environ.get("BIND", "127.0.0.1:5000")
+WORKERS = int(os.environ.get("WEB_WORKERS", os.cpu_count() or 1))
+THREADS = int(os.environ.get("WEB_THREADS", 8))
+# Summaries of long meetings can take minutes.
+TIMEOUT = int(os.environ.get("WEB_TIMEOUT", 300))
+# Where the workers' metrics snapshots are merged for /metrics; a new temporary
+# directory per server run if unset.
+METRICS_DIR = os.environ.get("METRICS_DIR")
+
+
+def warm_up(app) -> None:
+    """Load what the first requests would otherwise wait for.
+
+    A failing step is reported and skipped; the data is then loaded on first use.
+    """
+    def contacts():
+        full = load_full()
+        name_index.index_for(full)
+        with app.app_context():
+            encode_contacts("full", full)
+            encode_contacts("short", load_short())
+
+    steps = [
+        ("contacts", contacts),
+        ("note index", supa.load_note_index),
+        ("meetings", meetgeek.list_meetings),
+    ]
+    for name, step in steps:
+        t0 = time.monotonic()
+        try:
+            step()
+        except Exception as e:
+            print(f"warm-up {name} failed: {e}", flush=True)
+        else:
+            print(f"warm-up {name}: {time.monotonic() - t0:.2f}s", flush=True)
+
+
+def post_fork(server=None, worker=None) -> None:
+    # Sockets opened by the master must not be shared between workers.
+    http_client.reset()
+    if worker is not None:
+        # Workers rotating one log file could shift each other's backups.
+        request_log.use_worker_files()
+        metrics.after_fork()
+    job_queue.start_workers(process_meeting)
+
+
+if gunicorn is not None:
+    class _Application(gunicorn.app.base.BaseApplication):
+        def __init__(self, app, options: dict):
+            self.application = app
+            self.options = options
+            super().__init__()
+
+        def load_config(self):
+            for key, value in self.options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            return self.application
+
+
+def serve(bind: str = BIND, workers: int = WORKERS, threads: int = THREADS, warm: bool = True) -> None:
+    app = create_app()
+    if warm:
+        warm_up(app)
+
+    if gunicorn is None:
+        print("gunicorn is not installed; serving from one process", flush=True)
+        host, _, port = bind.rpartition(":")
+        post_fork()
+        app.run(host=host or "127.0.0.1", port=int(port), threaded=True)
+        return
+
+    # Any worker may answer a scrape, so /metrics sums every worker's snapshot.
+    metrics_dir = METRICS_DIR or tempfile.mkdtemp(prefix="antler-metrics-")
+    for path in glob.glob(os.path.join(glob.escape(metrics_dir), "*.json")):
+        os.remove(path)
+    metrics.share(metrics_dir)
+
+    options = {
+        "bind": bind,
+        "workers": workers,
+        "threads": threads,
+        "worker_class": "gthread",
+        "preload_app": True,
+        "timeout": TIMEOUT,
+        "post_fork": post_fork,
+    }
+    _Application(app, options).run()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--bind", default=BIND)
+    parser.add_argument("--workers", type=int, default=WORKERS)
+    parser.add_argument("--threads", type=int, default=THREADS)
+    parser.add_argument("--no-warm-up", action="store_true")
+    args = parser.parse_args()
+    serve(args.bind, args.workers, args.threads, warm=not args.no_warm_up)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Map-reduce summarisation for transcripts too long for one LLM request.
+
+The transcript is split at speaker-turn boundaries into chunks of roughly
+SUMMARY_CHUNK_TOKENS tokens. Each chunk is condensed into notes concurrently
+(map), then the notes are turned into the usual Intro / Followup / General
+report with summarize_prompt.system_prompt (reduce).
+"""
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import summarize_prompt
+import tracing
+from groq import get_groq_response
+
+
+# Transcripts estimated above this many tokens are summarised map-reduce.
+MAP_REDUCE_THRESHOLD = int(os.environ.get("SUMMARY_MAP_REDUCE_TOKENS", 24000))
+CHUNK_TOKENS = int(os.environ.get("SUMMARY_CHUNK_TOKENS", 8000))
+MAP_WORKERS = int(os.environ.get("SUMMARY_MAP_WORKERS", 4))
+
+# Rough average for English text; good enough to size requests.
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def needs_map_reduce(transcript: str) -> bool:
+    return estimate_tokens(transcript) > MAP_REDUCE_THRESHOLD
+
+
+def _split_long_turn(turn: str, max_chars: int) -> list[str]:
+    """Split a single over-long speaker turn at word boundaries."""
+    pieces = []
+    while len(turn) > max_chars:
+        cut = turn.rfind(" ", 0, max_chars)
+        if cut <= 0:
+            cut = max_chars
+        pieces.append(turn[:cut])
+        turn = turn[cut:].lstrip()
+    if turn:
+        pieces.append(turn)
+    return pieces
+
+
+def chunk_transcript(transcript: str, max_tokens: int = CHUNK_TOKENS) -> list[str]:
+    """Split a transcript into chunks of at most max_tokens, breaking between speaker turns."""
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    chunks: list[str] = []
+    current: list[str] = []
+    size = 0
+    for line in transcript.split("\n"):
+        for turn in _split_long_turn(line, max_chars):
+            if current and size + len(turn) + 1 > max_chars:
+                chunks.append("\n".join(current))
+                current, size = [], 0
+            current.append(turn)
+            size += len(turn) + 1
+    if current:
+        chunks.append("\n".join(current))
+    return chunks
+
+
+def reduce_prompt(transcript: str, participants: str, refresh: bool = False) -> str:
+    """Run the map step over transcript and return the user prompt for the reduce step.
+
+    refresh bypasses the Groq response cache for the chunk calls.
+    """
+    chunks = chunk_transcript(transcript)
+
+    def summarize_chunk(numbered: tuple[int, str]) -> str:
+        number, chunk = numbered
+        user_prompt = f"Participants: {participants}\n\nPart {number} of {len(chunks)}\n\n{chunk}"
+        return get_groq_response(summarize_prompt.chunk_prompt, user_prompt, bypass=refresh)
+
+    with tracing.span("map_step", chunks=len(chunks)), ThreadPoolExecutor(max_workers=MAP_WORKERS) as pool:
+        futures = [tracing.submit(pool, summarize_chunk, numbered) for numbered in enumerate(chunks, start=1)]
+        notes = [future.result() for future in futures]
+
+    joined = "\n\n".join(f"### Part {number}\n{note}" for number, note in enumerate(notes, start=1))
+    return f"Participants: {participants}\n\n{summarize_prompt.reduce_preamble}{joined}"
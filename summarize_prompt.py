@@ -80,4 +80,20 @@ format your response in markdown
 
 Here is the transcript:
 
-"""
\ No newline at end of file
+"""
+
+# Map step for long transcripts: each part is condensed into notes that the
+# reduce step then turns into a report using system_prompt.
+chunk_prompt = """
+
+You will be given one part of a longer transcript of a meeting between one or more people from our team (Antler Canada VC) and some other people. Other parts of the meeting are handled separately.
+
+Write detailed notes on this part only. Keep every fact that could matter for a meeting report: who spoke, what was said about Antler, its residency, timing and investment terms, the founders' backgrounds and whether they are full time, their idea/product/business, traction and money raised, advice given, and next steps. Do not write a report, do not add headings for sections that were not discussed, and do not speculate about other parts of the meeting.
+
+format your response as markdown bullet points
+
+Here is the part of the transcript:
+
+"""
+
+reduce_preamble = "The transcript was too long to send whole. Below are notes on each consecutive part of it, in order. Treat them as the transcript.\n\n"
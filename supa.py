@@ -1,45 +1,206 @@
 """
 Fetch contacts from Supabase via the get_unique_hubspot_attendees RPC.
+
+check_id() and existing_ids() answer from an in-process index of known
+notes.external_id values. The index is loaded on first use, updated when
+create_note_with_attendees succeeds, and topped up in the background with
+notes newer than the last one seen. A miss only goes to the REST API when
+the index has not been refreshed for NOTE_INDEX_MAX_AGE seconds, since
+another process may have created the note in the meantime. Deleted notes
+only leave the index when it is rebuilt in full, every NOTE_INDEX_REBUILD
+seconds, or when check_id(verify=True) finds them gone.
 """
-import json
 import os
+import threading
+import time
 import urllib.parse
-import urllib.request
-import urllib.error
+
+import http_client
+import metrics
+import tracing
 
 
 SUPABASE_URL = "https://uhvcbstdykcvgmzqpvpd.supabase.co"
 RPC_NAME = "get_unique_hubspot_attendees"
 
+# Meeting ids per `in.(...)` filter; keeps the query string well under URL limits.
+EXISTING_IDS_CHUNK = 100
+
+# A miss is trusted for this many seconds after the index was refreshed.
+NOTE_INDEX_MAX_AGE = float(os.environ.get("NOTE_INDEX_MAX_AGE", 30))
+NOTE_INDEX_PAGE = 1000
+# The index is reloaded from scratch this often, to forget deleted notes.
+NOTE_INDEX_REBUILD = float(os.environ.get("NOTE_INDEX_REBUILD", 3600))
+
 
-def check_id(id: str) -> bool:
-    """Return True if a row exists in the notes table with external_id == id, else False."""
+def _headers(key: str) -> dict:
+    return {
+        "Content-Type": "application/json",
+        "apikey": key,
+        "Authorization": f"Bearer {key}",
+    }
+
+
+def _get_key() -> str:
     key = os.environ.get("SUPABASE_SECRET")
     if not key:
         raise RuntimeError("SUPABASE_SECRET environment variable is not set")
+    return key
+
+
+class _NoteIndex:
+    """The external_id of every note, refreshed by fetching notes with id above the last seen."""
+
+    def __init__(self):
+        self.known: set[str] = set()
+        self.max_id = 0
+        self.refreshed_at: float | None = None
+        self.rebuilt_at: float | None = None
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._refreshing = False
+        # Recent add() calls, so a rebuild does not drop notes created while it ran.
+        self._added: list[tuple[float, str]] = []
+
+    def refresh(self) -> None:
+        """Fetch notes newer than the last one seen, page by page.
+
+        Once NOTE_INDEX_REBUILD seconds have passed since the last full load,
+        every note is fetched into a new set that then replaces the index.
+        """
+        key = _get_key()
+        with self._refresh_lock:
+            started = time.monotonic()
+            rebuild = self.rebuilt_at is None or started - self.rebuilt_at >= NOTE_INDEX_REBUILD
+            known: set[str] = set()
+            max_id = 0 if rebuild else self.max_id
+            pages = 0
+            while True:
+                params = urllib.parse.urlencode({
+                    "select": "id,external_id",
+                    "id": f"gt.{max_id}",
+                    "order": "id.asc",
+                    "limit": str(NOTE_INDEX_PAGE),
+                })
+                url = f"{SUPABASE_URL}/rest/v1/notes?{params}"
+                rows = http_client.request_json("GET", url, headers=_headers(key), service="Supabase")
+                pages += 1
+                known.update(row["external_id"] for row in rows if row.get("external_id"))
+                if rows:
+                    max_id = max(max_id, max(row["id"] for row in rows))
+                if len(rows) < NOTE_INDEX_PAGE:
+                    break
+            metrics.fetch_pages.observe(pages, fetch="supabase_note_index")
+            with self._lock:
+                if rebuild:
+                    # Keep notes added by create_note_with_attendees during the load.
+                    self.known = known | self._added_since(started)
+                    self.rebuilt_at = started
+                else:
+                    self.known.update(known)
+                self.max_id = max_id if rebuild else max(self.max_id, max_id)
+                self.refreshed_at = started
+
+    def _refresh_in_background(self) -> None:
+        try:
+            self.refresh()
+        except Exception:
+            pass
+        finally:
+            with self._lock:
+                self._refreshing = False
+
+    def fresh(self) -> bool:
+        """Return True if a miss can be trusted. Loads the index on first use and
+        starts a background refresh once it is stale."""
+        if self.refreshed_at is None:
+            try:
+                self.refresh()
+            except RuntimeError:
+                return False
+        with self._lock:
+            if time.monotonic() - self.refreshed_at < NOTE_INDEX_MAX_AGE:
+                return True
+            if not self._refreshing:
+                self._refreshing = True
+                threading.Thread(target=self._refresh_in_background, daemon=True).start()
+            return False
+
+    def add(self, external_id: str) -> None:
+        with self._lock:
+            self.known.add(external_id)
+            self._added.append((time.monotonic(), external_id))
+            del self._added[:-100]
+
+    def _added_since(self, started: float) -> set[str]:
+        return {external_id for added_at, external_id in self._added if added_at >= started}
+
+    def discard(self, external_id: str) -> None:
+        with self._lock:
+            self.known.discard(external_id)
+
+    def __contains__(self, external_id: str) -> bool:
+        return external_id in self.known
+
+
+_notes = _NoteIndex()
+
+
+def load_note_index() -> None:
+    """Load the external_id index now, e.g. at startup, rather than on the first check."""
+    _notes.refresh()
+
+
+def check_id(id: str, verify: bool = False) -> bool:
+    """Return True if a row exists in the notes table with external_id == id, else False.
+
+    verify=True skips the index and asks the REST API, e.g. just before
+    writing a note, since another worker may have written one meanwhile.
+    """
+    if not verify and (id in _notes or _notes.fresh()):
+        tracing.set_attributes(source="index")
+        return id in _notes
+    tracing.set_attributes(source="rest")
+    key = _get_key()
 
     # Query notes table for one row with this external_id
     params = urllib.parse.urlencode({"external_id": f"eq.{id}", "select": "id", "limit": "1"})
     url = f"{SUPABASE_URL}/rest/v1/notes?{params}"
-    req = urllib.request.Request(
-        url,
-        method="GET",
-        headers={
-            "Content-Type": "application/json",
-            "apikey": key,
-            "Authorization": f"Bearer {key}",
-        },
-    )
-
-    try:
-        with urllib.request.urlopen(req) as response:
-            rows = json.loads(response.read().decode())
-            return len(rows) > 0
-    except urllib.error.HTTPError as e:
-        body = e.read().decode()
-        raise RuntimeError(f"Supabase error {e.code}: {body}") from e
-    except urllib.error.URLError as e:
-        raise RuntimeError(f"Request failed: {e.reason}") from e
+    rows = http_client.request_json("GET", url, headers=_headers(key), service="Supabase")
+    if rows:
+        _notes.add(id)
+    else:
+        # The note may have been deleted since the index learnt of it.
+        _notes.discard(id)
+    return len(rows) > 0
+
+
+def existing_ids(ids: list[str], chunk_size: int = EXISTING_IDS_CHUNK) -> set[str]:
+    """Return the subset of ids that already have a row in the notes table (by external_id).
+
+    Ids missing from the index are checked chunk_size per request with an
+    `in.(...)` filter, unless the index is fresh.
+    """
+    ids = list(dict.fromkeys(ids))
+    # fresh() first: it loads the index on first use.
+    if _notes.fresh():
+        return {i for i in ids if i in _notes}
+    found = {i for i in ids if i in _notes}
+    ids = [i for i in ids if i not in found]
+    if not ids:
+        return found
+    key = _get_key()
+
+    for start in range(0, len(ids), chunk_size):
+        chunk = ids[start:start + chunk_size]
+        quoted = ",".join('"' + i.replace('"', '\\"') + '"' for i in chunk)
+        params = urllib.parse.urlencode({"external_id": f"in.({quoted})", "select": "external_id"})
+        url = f"{SUPABASE_URL}/rest/v1/notes?{params}"
+        rows = http_client.request_json("GET", url, headers=_headers(key), service="Supabase")
+        for row in rows:
+            _notes.add(row["external_id"])
+            found.add(row["external_id"])
+    return found
 
 
 def get_contacts_from_supabase() -> list[dict]:
@@ -49,26 +210,7 @@ def get_contacts_from_supabase() -> list[dict]:
         raise RuntimeError("SUPABASE_SECRET environment variable is not set")
 
     url = f"{SUPABASE_URL}/rest/v1/rpc/{RPC_NAME}"
-    data = json.dumps({}).encode("utf-8")
-    req = urllib.request.Request(
-        url,
-        data=data,
-        method="POST",
-        headers={
-            "Content-Type": "application/json",
-            "apikey": key,
-            "Authorization": f"Bearer {key}",
-        },
-    )
-
-    try:
-        with urllib.request.urlopen(req) as response:
-            return json.loads(response.read().decode())
-    except urllib.error.HTTPError as e:
-        body = e.read().decode()
-        raise RuntimeError(f"Supabase RPC error {e.code}: {body}") from e
-    except urllib.error.URLError as e:
-        raise RuntimeError(f"Request failed: {e.reason}") from e
+    return http_client.request_json("POST", url, headers=_headers(key), payload={}, service="Supabase RPC")
 
 
 def create_note_with_attendees(
@@ -95,23 +237,7 @@ def create_note_with_attendees(
     if meeting_at is not None:
         payload["meeting_at"] = meeting_at
 
-    data = json.dumps(payload).encode("utf-8")
-    req = urllib.request.Request(
-        url,
-        data=data,
-        method="POST",
-        headers={
-            "Content-Type": "application/json",
-            "apikey": key,
-            "Authorization": f"Bearer {key}",
-        },
-    )
-
-    try:
-        with urllib.request.urlopen(req) as response:
-            return json.loads(response.read().decode())
-    except urllib.error.HTTPError as e:
-        body = e.read().decode()
-        raise RuntimeError(f"Supabase RPC error {e.code}: {body}") from e
-    except urllib.error.URLError as e:
-        raise RuntimeError(f"Request failed: {e.reason}") from e
+    note_id = http_client.request_json("POST", url, headers=_headers(key), payload=payload, service="Supabase RPC")
+    if meeting_id is not None:
+        _notes.add(meeting_id)
+    return note_id
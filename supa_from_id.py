@@ -1,34 +1,102 @@
 # supa_from_id
 
 from meetgeek import get_stats, get_transcript
+import summarize
 import summarize_prompt
+import generate_ids as generate_ids_module
+import transcript_store
 from generate_ids import generate_ids
 from supa import create_note_with_attendees
-from groq import get_groq_response
+from groq import get_groq_response, stream_groq_response
 from supa import check_id
+import tracing
 
-def summarize_transcript(id):
-    # load system prompt for summerize_prompt.md from the same directory
-    system_prompt = summarize_prompt.system_prompt
+def recording_header(id):
+    return f"## Recording\nThis note was created from [this MeetGeek video](https://app2.meetgeek.ai/meeting/{id})\n\n"
+
+def _summary_prompt(id, refresh=False):
+    """Return (user prompt for summarize_prompt.system_prompt, ids) for meeting id.
+
+    Long transcripts are condensed map-reduce first, so the prompt holds notes
+    on each part instead of the transcript itself.
+    """
     transcript = get_transcript(id)
     ids = generate_ids(id)
     names = [item['name'] for item in ids]
     participants = ", ".join(names)
-    user_prompt = f"Participants: {participants}\n\n{transcript['transcript']}"
-    response = get_groq_response(system_prompt, user_prompt)
-    prepend = f"## Recording\nThis note was created from [this MeetGeek video](https://app2.meetgeek.ai/meeting/{id})\n\n"
-    return {"summary": prepend + response, "ids": ids}
+    map_reduce = summarize.needs_map_reduce(transcript['transcript'])
+    tracing.set_attributes(transcript_chars=len(transcript['transcript']), map_reduce=map_reduce)
+    if map_reduce:
+        # Too long for one request: summarise parts concurrently, then merge.
+        return summarize.reduce_prompt(transcript['transcript'], participants, refresh), ids
+    return f"Participants: {participants}\n\n{transcript['transcript']}", ids
+
+def summarize_transcript(id, refresh=False):
+    """Summarise meeting id. refresh=True bypasses the Groq response cache."""
+    # load system prompt for summerize_prompt.md from the same directory
+    system_prompt = summarize_prompt.system_prompt
+    with tracing.span("summarize_transcript", meeting_id=id, refresh=refresh):
+        user_prompt, ids = _summary_prompt(id, refresh)
+        response = get_groq_response(system_prompt, user_prompt, bypass=refresh)
+    return {"summary": recording_header(id) + response, "ids": ids}
+
+def stream_summary(id, refresh=False):
+    """Yield ("text", chunk) events for the summary of meeting id, then ("ids", ids).
+
+    The recording header is yielded before any upstream work, then summary
+    tokens are forwarded as Groq generates them.
+    """
+    yield "text", recording_header(id)
+    user_prompt, ids = _summary_prompt(id, refresh)
+    for chunk in stream_groq_response(summarize_prompt.system_prompt, user_prompt, bypass=refresh):
+        yield "text", chunk
+    yield "ids", ids
 
 def write_to_supa(note_text: str, attendees: list[dict], meeting_id: str | None = None, meeting_at: str | None = None) -> int:
     """Write a note and its attendees to Supabase via create_note_with_attendees. Returns the new note id."""
     return create_note_with_attendees(note_text, attendees, meeting_id=meeting_id, meeting_at=meeting_at)
 
+def refresh_transcript(id):
+    """Re-fetch the transcript of meeting id from MeetGeek into transcript_store.
+
+    A copy stored by an earlier request (/ids, /get_transcript, ...) may
+    predate MeetGeek finishing its analysis. If the transcript changed, the
+    names and ids derived from the old copy are dropped too.
+    """
+    stored = transcript_store.get(id)
+    transcript = get_transcript(id, refresh=True)
+    if stored is not None and stored != transcript:
+        generate_ids_module.forget(id)
+    return transcript
+
 def supa_from_id(id):
-    if check_id(id):
-        return
-    stats = get_stats(id)
-    if stats["duration"] < 300:
-        return
-    summary = summarize_transcript(id)
-    note_id = write_to_supa(summary["summary"], summary["ids"], id, stats["start_time"])
+    """Summarise meeting id and write it to Supabase; returns None if it exists or is under 5 minutes."""
+    with tracing.span("supa_from_id", meeting_id=id) as span:
+        with tracing.span("check_id") as check:
+            # The index may still hold a note deleted since; confirm a hit with REST.
+            exists = check_id(id) and check_id(id, verify=True)
+            check.set(exists=exists)
+        if exists:
+            span.set(outcome="exists")
+            return
+        with tracing.span("get_stats") as stage:
+            stats = get_stats(id)
+            stage.set(duration=stats["duration"])
+        if stats["duration"] < 300:
+            span.set(outcome="too_short")
+            return
+        refresh_transcript(id)
+        summary = summarize_transcript(id)
+        # Summarising can take minutes; a webhook job or backfill may have
+        # written the note meanwhile, and the index only learns of that later.
+        with tracing.span("check_id", verify=True) as check:
+            exists = check_id(id, verify=True)
+            check.set(exists=exists)
+        if exists:
+            span.set(outcome="exists")
+            return
+        with tracing.span("create_note_with_attendees", attendees=len(summary["ids"])) as stage:
+            note_id = write_to_supa(summary["summary"], summary["ids"], id, stats["start_time"])
+            stage.set(note_id=note_id)
+        span.set(outcome="created")
     return {"note_id": note_id, "summary": summary["summary"], "ids": summary["ids"], "stats": stats}
\ No newline at end of file
@@ -0,0 +1,123 @@
+"""
+Lightweight nested spans for following a meeting through the pipeline.
+
+    with tracing.span("get_transcript", meeting_id=id) as span:
+        ...
+        span.set(pages=3)
+
+Spans nest through a context variable. All spans of one trace share a
+trace_id, which is the request_log request id when there is one (so a job's
+trace id is "job-<meeting_id>"), and a new id otherwise. Finished spans are
+appended to TRACE_FILE as JSON lines by a request_log.JsonLinesWriter, and
+get_trace() reads one trace back (served at /traces/<trace_id>).
+
+Work handed to an executor runs in another thread, which does not see the
+current span: submit it with tracing.submit(pool, fn, ...) instead of
+pool.submit(fn, ...) to keep its spans in the trace.
+"""
+import atexit
+import contextvars
+import json
+import os
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+
+import request_log
+
+
+TRACE_FILE = os.environ.get("TRACE_FILE", "traces.jsonl")
+
+_current = contextvars.ContextVar("tracing_span", default=None)
+_writer = request_log.JsonLinesWriter(TRACE_FILE)
+atexit.register(_writer.flush)
+
+
+class Span:
+    def __init__(self, name: str, trace_id: str, parent_id: str | None, attributes: dict):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent_id
+        self.attributes = attributes
+        self.started_at = datetime.now().isoformat()
+        self._start = time.perf_counter()
+
+    def set(self, **attributes) -> None:
+        self.attributes.update(attributes)
+
+    def as_dict(self) -> dict:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start": self.started_at,
+            "seconds": round(time.perf_counter() - self._start, 6),
+            "attributes": self.attributes,
+        }
+
+
+@contextmanager
+def span(name: str, **attributes):
+    """Time the enclosed block as a child of the current span. An exception is recorded as "error"."""
+    current = start_span(name, **attributes)
+    token = _current.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.attributes["error"] = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        _current.reset(token)
+        finish(current)
+
+
+def start_span(name: str, **attributes) -> Span:
+    """Start a child of the current span without making it current; end it with finish().
+
+    For generators, which must not hold a context variable across yields.
+    """
+    parent = _current.get()
+    if parent is not None:
+        return Span(name, parent.trace_id, parent.span_id, attributes)
+    return Span(name, request_log.current_request_id() or uuid.uuid4().hex, None, attributes)
+
+
+def finish(span: Span) -> None:
+    _writer.put(span.as_dict())
+
+
+def flush(timeout: float = 5.0) -> None:
+    """Wait for finished spans to reach the trace file."""
+    _writer.flush(timeout)
+
+
+def set_attributes(**attributes) -> None:
+    """Add attributes to the current span, if any."""
+    current = _current.get()
+    if current is not None:
+        current.set(**attributes)
+
+
+def submit(pool, fn, *args, **kwargs):
+    """pool.submit(fn, ...) with the caller's context, so spans in fn join the current trace."""
+    return pool.submit(contextvars.copy_context().run, fn, *args, **kwargs)
+
+
+def get_trace(trace_id: str) -> list[dict]:
+    """Return the exported spans of trace_id, in start order."""
+    _writer.flush()
+    needle = f'"trace_id": {json.dumps(trace_id)}'
+    spans = []
+    for path in _writer.files():
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    if needle in line:
+                        spans.append(json.loads(line))
+        except FileNotFoundError:
+            continue
+    spans.sort(key=lambda s: s["start"])
+    return spans
@@ -0,0 +1,143 @@
+"""
+On-disk store of MeetGeek transcripts so each meeting is paged from the API
+at most once.
+
+Entries live under TRANSCRIPT_STORE_DIR, addressed by the sha256 of the
+meeting id:
+
+  <dir>/<digest[:2]>/<digest>/pages.jsonl       raw sentence pages, one per line
+  <dir>/<digest[:2]>/<digest>/transcript.json   process_transcript output + meta
+
+The store is bounded by TRANSCRIPT_STORE_MAX_BYTES and
+TRANSCRIPT_STORE_MAX_AGE (seconds); the oldest entries are evicted first.
+"""
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+
+
+STORE_DIR = os.environ.get("TRANSCRIPT_STORE_DIR", "transcript_store")
+MAX_BYTES = int(os.environ.get("TRANSCRIPT_STORE_MAX_BYTES", 512 * 1024 * 1024))
+MAX_AGE = int(os.environ.get("TRANSCRIPT_STORE_MAX_AGE", 90 * 24 * 3600))
+
+PAGES_FILE = "pages.jsonl"
+TRANSCRIPT_FILE = "transcript.json"
+
+_lock = threading.Lock()
+
+
+def _entry_dir(meeting_id: str) -> str:
+    digest = hashlib.sha256(meeting_id.encode("utf-8")).hexdigest()
+    return os.path.join(STORE_DIR, digest[:2], digest)
+
+
+def get(meeting_id: str) -> dict | None:
+    """Return the stored transcript dict for meeting_id, or None if absent or expired."""
+    path = os.path.join(_entry_dir(meeting_id), TRANSCRIPT_FILE)
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            entry = json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return None
+    if entry.get("meeting_id") != meeting_id:
+        return None
+    if time.time() - entry.get("stored_at", 0) > MAX_AGE:
+        return None
+    return entry["transcript"]
+
+
+class EntryWriter:
+    """Writes one entry page by page, so raw pages need not be held in memory.
+
+    Nothing is visible to readers until commit(); abort() discards the partial
+    entry. Write failures are swallowed so they never break the caller.
+    """
+
+    def __init__(self, meeting_id: str):
+        self.meeting_id = meeting_id
+        self.entry_dir = _entry_dir(meeting_id)
+        self._pages_tmp = os.path.join(self.entry_dir, f"{PAGES_FILE}.{os.getpid()}.{threading.get_ident()}.tmp")
+        try:
+            os.makedirs(self.entry_dir, exist_ok=True)
+            self._pages = open(self._pages_tmp, "w", encoding="utf-8")
+        except OSError:
+            self._pages = None
+
+    def add_page(self, page: list[dict]) -> None:
+        if self._pages is None:
+            return
+        try:
+            self._pages.write(json.dumps(page, ensure_ascii=False))
+            self._pages.write("\n")
+        except OSError:
+            self.abort()
+
+    def commit(self, transcript: dict) -> None:
+        if self._pages is None:
+            return
+        try:
+            self._pages.close()
+            self._pages = None
+            os.replace(self._pages_tmp, os.path.join(self.entry_dir, PAGES_FILE))
+
+            entry = {
+                "meeting_id": self.meeting_id,
+                "stored_at": time.time(),
+                "transcript": transcript,
+            }
+            tmp = os.path.join(self.entry_dir, f"{TRANSCRIPT_FILE}.{os.getpid()}.{threading.get_ident()}.tmp")
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(entry, f, ensure_ascii=False)
+            os.replace(tmp, os.path.join(self.entry_dir, TRANSCRIPT_FILE))
+        except OSError:
+            return
+        evict()
+
+    def abort(self) -> None:
+        if self._pages is not None:
+            self._pages.close()
+            self._pages = None
+        try:
+            os.remove(self._pages_tmp)
+        except OSError:
+            pass
+
+
+def _entries() -> list[tuple[float, int, str]]:
+    """Return (stored mtime, size in bytes, path) for every entry in the store."""
+    entries = []
+    if not os.path.isdir(STORE_DIR):
+        return entries
+    for prefix in os.listdir(STORE_DIR):
+        prefix_dir = os.path.join(STORE_DIR, prefix)
+        if not os.path.isdir(prefix_dir):
+            continue
+        for digest in os.listdir(prefix_dir):
+            entry_dir = os.path.join(prefix_dir, digest)
+            size = 0
+            mtime = 0.0
+            try:
+                for name in os.listdir(entry_dir):
+                    st = os.stat(os.path.join(entry_dir, name))
+                    size += st.st_size
+                    mtime = max(mtime, st.st_mtime)
+            except OSError:
+                continue
+            entries.append((mtime, size, entry_dir))
+    return entries
+
+
+def evict() -> None:
+    """Drop entries older than MAX_AGE, then the oldest until under MAX_BYTES."""
+    with _lock:
+        now = time.time()
+        entries = sorted(_entries())
+        total = sum(size for _, size, _ in entries)
+        for mtime, size, entry_dir in entries:
+            if now - mtime <= MAX_AGE and total <= MAX_BYTES:
+                break
+            shutil.rmtree(entry_dir, ignore_errors=True)
+            total -= size